@@ -3,9 +3,16 @@
 from __future__ import annotations
 
 import asyncio
+import bisect
+import concurrent.futures
+import functools
 import logging
+import os
+import queue as queue_mod
+import sys
+import threading
 import time
-from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
 import numpy as np
 import sounddevice as sd
@@ -16,36 +23,212 @@ from agent import echo_guard
 
 logger = logging.getLogger(__name__)
 
-# Optional: silero-vad for speech detection (fallback: simple energy threshold)
-try:
-    import torch
-    torch.set_num_threads(1)
-    _vad_model, _utils = torch.hub.load(repo_or_dir="snakers4/silero-vad", model="silero_vad", trust_repo=True)
-    _get_speech_timestamps = _utils[0]
-    HAS_SILERO = True
-except Exception as e:
-    logger.warning("Silero VAD not available: %s. Using energy-based VAD.", e)
-    HAS_SILERO = False
-
-_executor = ThreadPoolExecutor(max_workers=1)
-
 # Audio config
 SAMPLE_RATE = 16000
-CHUNK_MS = 30
+CHUNK_MS = 32  # 512 samples at 16 kHz: the window size Silero's ONNX export expects
 CHUNK_SAMPLES = int(SAMPLE_RATE * CHUNK_MS / 1000)
 SILENCE_MS = config.STT_SILENCE_MS  # end of utterance after this much silence
 MIN_UTTERANCE_MS = config.STT_MIN_UTTERANCE_MS
 MAX_UTTERANCE_MS = config.STT_MAX_UTTERANCE_MS
 MIN_SPEECH_START_MS = config.STT_MIN_SPEECH_START_MS
 ENERGY_THRESHOLD = config.STT_ENERGY_THRESHOLD
+SILERO_THRESHOLD = 0.5
+
+# Optional: silero-vad for speech detection. Prefer the ONNX export (one session.run per chunk, no torch
+# dispatch in the audio callback); fall back to the torch.hub model, then to a simple energy threshold.
+_vad_session = None
+_vad_model = None
+HAS_SILERO = False
+try:
+    import onnxruntime as ort
+
+    if not Path(config.SILERO_VAD_ONNX).is_file():
+        raise FileNotFoundError(config.SILERO_VAD_ONNX)
+    _opts = ort.SessionOptions()
+    _opts.intra_op_num_threads = 1
+    _opts.inter_op_num_threads = 1
+    _vad_session = ort.InferenceSession(config.SILERO_VAD_ONNX, sess_options=_opts, providers=["CPUExecutionProvider"])
+    _vad_input_names = {i.name for i in _vad_session.get_inputs()}
+    HAS_SILERO = True
+    logger.info("Silero VAD: ONNX session loaded from %s", config.SILERO_VAD_ONNX)
+except Exception as e:
+    logger.info("Silero VAD ONNX not available (%s); trying torch.hub model.", e)
+    try:
+        import torch
+        torch.set_num_threads(1)
+        _vad_model, _utils = torch.hub.load(repo_or_dir="snakers4/silero-vad", model="silero_vad", trust_repo=True)
+        _get_speech_timestamps = _utils[0]
+        HAS_SILERO = True
+    except Exception as torch_err:
+        logger.warning("Silero VAD not available: %s. Using energy-based VAD.", torch_err)
+
+_vad_sr = np.array(SAMPLE_RATE, dtype=np.int64)
+_vad_state: dict[str, np.ndarray] = {}
+
+
+def _reset_vad_state() -> None:
+    """Clear the recurrent state of the streaming ONNX VAD (start of a new utterance window)."""
+    if _vad_session is None:
+        return
+    if "state" in _vad_input_names:  # silero-vad v5: single combined state tensor
+        _vad_state["state"] = np.zeros((2, 1, 128), dtype=np.float32)
+    else:  # silero-vad v4: separate LSTM h/c tensors
+        _vad_state["h"] = np.zeros((2, 1, 64), dtype=np.float32)
+        _vad_state["c"] = np.zeros((2, 1, 64), dtype=np.float32)
+
+
+_reset_vad_state()
+
+
+def _silero_onnx_prob(chunk: np.ndarray) -> float:
+    """Speech probability for one CHUNK_SAMPLES float32 window; carries the LSTM state between calls."""
+    feeds = {"input": chunk.reshape(1, -1), "sr": _vad_sr, **_vad_state}
+    out = _vad_session.run(None, feeds)
+    if "state" in _vad_state:
+        _vad_state["state"] = out[1]
+    else:
+        _vad_state["h"], _vad_state["c"] = out[1], out[2]
+    return float(out[0].reshape(-1)[0])
+
+
+# Up to this many utterances that queued up behind a running transcription share the next Whisper call.
+WHISPER_BATCH_MAX = 4
+_BATCH_GAP = np.zeros(SAMPLE_RATE // 2, dtype=np.int16)  # 500 ms silence between batched utterances
+
+# Fastest-first CTranslate2 compute types; the first one the device actually supports wins.
+_COMPUTE_TYPE_PREFERENCE = ("int8_float16", "float16", "int8", "float32")
+
+
+@functools.lru_cache(maxsize=None)
+def _select_compute_type(device: str) -> str:
+    """Pick the fastest Whisper compute_type this machine supports (TRANSIT_WHISPER_COMPUTE overrides)."""
+    if config.WHISPER_COMPUTE_TYPE:
+        return config.WHISPER_COMPUTE_TYPE
+    try:
+        import ctranslate2
+        supported = ctranslate2.get_supported_compute_types(device)
+    except Exception as e:
+        logger.warning("Could not query CTranslate2 compute types for %s: %s", device, e)
+        return "int8"
+    for compute_type in _COMPUTE_TYPE_PREFERENCE:
+        if compute_type in supported:
+            return compute_type
+    return "default"
+
+
+# Loaded Whisper models, keyed by (model_name, device, compute_type); re-entering the generator reuses them.
+_WHISPER_CACHE: dict[tuple[str, str, str], WhisperModel] = {}
+_WHISPER_LOCK = threading.Lock()
+
+
+def _get_whisper(model_name: str, device: str, compute_type: str) -> WhisperModel:
+    """Return a cached WhisperModel, loading it on first use (construction is not thread-safe)."""
+    key = (model_name, device, compute_type)
+    with _WHISPER_LOCK:
+        model = _WHISPER_CACHE.get(key)
+        if model is None:
+            logger.info("Whisper %s on %s: compute_type=%s", model_name, device, compute_type)
+            # CTranslate2 starts its compute threads during construction and they inherit the constructing
+            # thread's affinity, so build the model on a thread already pinned off the audio core.
+            with concurrent.futures.ThreadPoolExecutor(max_workers=1, initializer=_pin_off_audio_core) as pool:
+                model = _WHISPER_CACHE.setdefault(key, pool.submit(
+                    WhisperModel,
+                    model_name,
+                    device=device,
+                    compute_type=compute_type,
+                    cpu_threads=max(1, (os.cpu_count() or 2) // 2),
+                    num_workers=1,
+                ).result())
+        return model
+
+
+# Mic audio is captured as int16; full scale is 32768. Converted to float32 only for Silero and Whisper.
+_INT16_SCALE = np.float32(1.0 / 32768)
+_abs_scratch = np.empty(CHUNK_SAMPLES, dtype=np.int16)
+# Energy threshold on the int16 scale (mean |x|), and minimum zero-crossing rate per sample (0 = off).
+_ENERGY_THRESHOLD_I16 = ENERGY_THRESHOLD * 32768
+ZCR_MIN = config.STT_ZCR_MIN
+
+# Optional: numba compiles the per-chunk feature scan into one native loop; numpy fallback otherwise.
+try:
+    import numba
 
+    @numba.njit(cache=True, fastmath=True)
+    def vad_features(x: np.ndarray) -> tuple[float, float, float]:
+        """(mean |x|, zero crossings per sample, log10 mean energy) for an int16 chunk, in one pass."""
+        n = x.shape[0]
+        if n == 0:
+            return 0.0, 0.0, 0.0
+        abs_sum = 0
+        sq_sum = 0.0
+        crossings = 0
+        prev_neg = x[0] < 0
+        for i in range(n):
+            v = np.int64(x[i])
+            abs_sum += abs(v)
+            sq_sum += v * v
+            neg = v < 0
+            if neg != prev_neg:
+                crossings += 1
+            prev_neg = neg
+        return abs_sum / n, crossings / n, np.log10(sq_sum / n + 1.0)
 
-def _energy_vad(samples: np.ndarray, threshold: float = ENERGY_THRESHOLD) -> bool:
-    """Simple energy-based voice activity."""
-    return float(np.abs(samples).mean()) > threshold
+    vad_features(np.zeros(CHUNK_SAMPLES, dtype=np.int16))  # compile (or load from cache) now, not mid-utterance
+except ImportError:
+    def vad_features(x: np.ndarray) -> tuple[float, float, float]:
+        """(mean |x|, zero crossings per sample, log10 mean energy) for an int16 chunk."""
+        n = len(x)
+        if n == 0:
+            return 0.0, 0.0, 0.0
+        out = _abs_scratch if x.shape == _abs_scratch.shape else None
+        # abs(-32768) wraps to -32768 in int16; the uint16 view reads it back as 32768.
+        abs_sum = int(np.abs(x, out=out).view(np.uint16).sum(dtype=np.uint64))
+        neg = np.signbit(x)
+        crossings = int(np.count_nonzero(neg[1:] != neg[:-1]))
+        xf = x.astype(np.float64)
+        return abs_sum / n, crossings / n, float(np.log10(np.dot(xf, xf) / n + 1.0))
 
 
-# Queue-based async generator: callback runs in sounddevice thread; Whisper runs in executor; results go to queue.
+def _energy_vad(samples: np.ndarray) -> bool:
+    """Energy (+ optional zero-crossing) voice activity on int16 samples."""
+    mean_abs, zcr, _log_energy = vad_features(samples)
+    return mean_abs > _ENERGY_THRESHOLD_I16 and zcr >= ZCR_MIN
+
+
+# Linux scheduling: the PortAudio callback thread runs SCHED_FIFO (promoted from inside the callback,
+# since sounddevice doesn't expose the thread), and the Whisper thread stays off core 0.
+_IS_LINUX = sys.platform.startswith("linux")
+AUDIO_RT_PRIORITY = config.STT_AUDIO_RT_PRIORITY
+
+
+def _set_realtime_priority(priority: int) -> str:
+    """Put the calling thread in SCHED_FIFO at priority (Linux; needs CAP_SYS_NICE or an rtprio limit).
+    Returns a description of the outcome; it doesn't log, since it runs inside the audio callback."""
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+        return f"SCHED_FIFO priority {priority}"
+    except (AttributeError, OSError) as e:
+        return f"real-time priority unavailable ({e})"
+
+
+def _pin_off_audio_core() -> None:
+    """Restrict the calling thread to cores 1..n-1 so Whisper never competes with the audio callback."""
+    ncpu = os.cpu_count() or 1
+    if not _IS_LINUX or ncpu < 2:
+        return
+    try:
+        os.sched_setaffinity(0, set(range(1, ncpu)))
+    except (AttributeError, OSError) as e:
+        logger.debug("Whisper thread affinity not set: %s", e)
+
+
+# Ring buffer holding the most recent mic audio; the sounddevice callback only copies into it.
+RING_SAMPLES = SAMPLE_RATE * 10
+# Utterance buffer: max utterance plus the pre-speech lead-in, with a second of slack for worker lag.
+UTTERANCE_BUF_SAMPLES = (MAX_UTTERANCE_MS + MIN_SPEECH_START_MS + 1000) * SAMPLE_RATE // 1000
+
+# Queue-based async generator: callback fills a ring buffer in the sounddevice thread; a VAD worker thread
+# segments utterances and hands them to the Whisper worker thread; results go to the asyncio queue.
 _transcript_queue: asyncio.Queue | None = None
 
 
@@ -54,117 +237,229 @@ async def transcripts_from_mic_queued(
     device: str = "cpu",
     input_device: int | None = None,
 ):
-    """Async generator yielding transcript strings. Uses a queue fed by the audio callback."""
+    """Async generator yielding transcript strings. Uses a queue fed by the VAD worker thread."""
     global _transcript_queue
     _transcript_queue = asyncio.Queue()
-    model = WhisperModel(model_name, device=device, compute_type="int8")
-    buffer: list[np.ndarray] = []
-    pre_speech_buffer: list[np.ndarray] = []
-    silence_frames = 0
-    speech_start_frames = 0
-    speech_started = False
-    utterance_start_ts = 0.0
+    queue = _transcript_queue
+    model = _get_whisper(model_name, device, _select_compute_type(device))
     loop = asyncio.get_event_loop()
+    ring = np.zeros(RING_SAMPLES, dtype=np.int16)
+    ring_w = 0  # total samples written; only the callback advances it
+    data_ready = threading.Event()
+    stop = threading.Event()
+    utterance_queue: queue_mod.Queue[np.ndarray | None] = queue_mod.Queue()
+
+    rt_pending = _IS_LINUX and AUDIO_RT_PRIORITY > 0
+    rt_outcome: str | None = None  # set by the callback, logged by the VAD worker
 
     def audio_callback(indata: np.ndarray, frames: int, time_info, status):
-        nonlocal speech_started, silence_frames, utterance_start_ts, speech_start_frames
+        nonlocal ring_w, rt_pending, rt_outcome
+        if rt_pending:
+            rt_pending = False
+            rt_outcome = _set_realtime_priority(AUDIO_RT_PRIORITY)
         if status:
             logger.debug("Sounddevice: %s", status)
-        if echo_guard.is_gated():
-            buffer.clear()
-            pre_speech_buffer.clear()
-            speech_started = False
-            silence_frames = 0
-            speech_start_frames = 0
-            utterance_start_ts = 0.0
-            return
-        chunk = indata.copy().flatten()
-        if HAS_SILERO:
-            ts = _get_speech_timestamps(
-                torch.from_numpy(chunk).float(),
-                _vad_model,
-                sampling_rate=SAMPLE_RATE,
-                threshold=0.5,
-                min_speech_duration_ms=100,
-            )
-            is_speech = bool(ts)
+        pos = ring_w % RING_SAMPLES
+        end = pos + frames
+        if end <= RING_SAMPLES:
+            ring[pos:end] = indata[:, 0]
         else:
-            is_speech = _energy_vad(chunk)
-
-        if not speech_started:
-            if is_speech:
-                speech_start_frames += 1
-                pre_speech_buffer.append(chunk)
-                if speech_start_frames * CHUNK_MS >= MIN_SPEECH_START_MS:
-                    speech_started = True
-                    utterance_start_ts = time.monotonic()
-                    silence_frames = 0
-                    buffer.extend(pre_speech_buffer)
-                    pre_speech_buffer.clear()
-            else:
-                pre_speech_buffer.clear()
-                speech_start_frames = 0
-            return
-
-        # speech_started == True
-        buffer.append(chunk)
-        if is_speech:
-            silence_frames = 0
+            split = RING_SAMPLES - pos
+            ring[pos:] = indata[:split, 0]
+            ring[: end - RING_SAMPLES] = indata[split:, 0]
+        ring_w += frames
+        data_ready.set()
+
+    def put_result(text: str) -> None:
+        if text:
+            loop.call_soon_threadsafe(queue.put_nowait, (text, time.monotonic()))
+
+    def run_whisper(utterances: list[np.ndarray]) -> list[str]:
+        """Transcribe one or more utterances in a single Whisper call; returns one text per utterance."""
+        if len(utterances) == 1:
+            to_process = utterances[0]
+            offsets = [0]
         else:
-            silence_frames += 1
-
-        elapsed_ms = int((time.monotonic() - utterance_start_ts) * 1000) if utterance_start_ts else 0
-        silence_reached = silence_frames * CHUNK_MS >= SILENCE_MS
-        max_reached = elapsed_ms >= MAX_UTTERANCE_MS
-        if silence_reached or max_reached:
-            if max_reached and not silence_reached:
-                logger.info("STT forcing utterance flush at max duration (%d ms)", elapsed_ms)
-            to_process = np.concatenate(buffer) if buffer else np.array([], dtype=np.float32)
-            buffer.clear()
-            pre_speech_buffer.clear()
-            speech_started = False
-            silence_frames = 0
-            speech_start_frames = 0
-            utterance_start_ts = 0.0
-            if len(to_process) >= int(MIN_UTTERANCE_MS / 1000 * SAMPLE_RATE):
-                def run_whisper():
-                    segments, _ = model.transcribe(to_process, language="en", vad_filter=True)
-                    return " ".join(s.text.strip() for s in segments if s.text).strip()
-
-                def put_result(fut):
-                    try:
-                        text = fut.result()
-                        if text and _transcript_queue is not None:
-                            _transcript_queue.put_nowait((text, time.monotonic()))
-                    except Exception as e:
-                        logger.exception("Whisper failed: %s", e)
-
-                fut = loop.run_in_executor(_executor, run_whisper)
-                loop.call_soon_threadsafe(fut.add_done_callback, put_result)
+            # Concatenate with silence gaps and map each segment back to its utterance by start time.
+            offsets = []
+            parts: list[np.ndarray] = []
+            pos = 0
+            for u in utterances:
+                if parts:
+                    parts.append(_BATCH_GAP)
+                    pos += len(_BATCH_GAP)
+                offsets.append(pos)
+                parts.append(u)
+                pos += len(u)
+            to_process = np.concatenate(parts)
+        audio = np.multiply(to_process, _INT16_SCALE, dtype=np.float32)
+        # Utterances are already segmented; faster-whisper's own Silero pass is only needed without Silero here.
+        # Greedy decoding with no carried prompt suits short, independent voice commands.
+        segments, _ = model.transcribe(
+            audio,
+            language="en",
+            vad_filter=not HAS_SILERO,
+            beam_size=1,
+            condition_on_previous_text=False,
+        )
+        texts: list[list[str]] = [[] for _ in utterances]
+        for seg in segments:
+            if not seg.text:
+                continue
+            start = int(seg.start * SAMPLE_RATE)
+            idx = max(0, bisect.bisect_right(offsets, start) - 1)
+            texts[idx].append(seg.text.strip())
+        return [" ".join(t).strip() for t in texts]
+
+    def whisper_loop() -> None:
+        """Transcribe queued utterances; whatever piled up while Whisper was busy goes in as one batch."""
+        _pin_off_audio_core()
+        while True:
+            item = utterance_queue.get()
+            if item is None:
+                return
+            batch = [item]
+            while len(batch) < WHISPER_BATCH_MAX:
+                try:
+                    nxt = utterance_queue.get_nowait()
+                except queue_mod.Empty:
+                    break
+                if nxt is None:
+                    utterance_queue.put(None)
+                    break
+                batch.append(nxt)
+            if len(batch) > 1:
+                logger.info("STT batching %d pending utterances into one Whisper call", len(batch))
+            try:
+                for text in run_whisper(batch):
+                    put_result(text)
+            except Exception as e:
+                logger.exception("Whisper failed: %s", e)
+
+    def vad_loop() -> None:
+        nonlocal rt_outcome
+        # One preallocated utterance buffer; pre-speech chunks are written at the front and kept once speech starts.
+        utter_buf = np.empty(UTTERANCE_BUF_SAMPLES, dtype=np.int16)
+        write_off = 0
+        silence_frames = 0
+        speech_start_frames = 0
+        speech_started = False
+        utterance_start_ts = 0.0
+        read = 0
+        chunk = np.empty(CHUNK_SAMPLES, dtype=np.int16)
+        chunk_f32 = np.empty(CHUNK_SAMPLES, dtype=np.float32)  # Silero input
+
+        while not stop.is_set():
+            data_ready.wait(timeout=0.5)
+            data_ready.clear()
+            if rt_outcome is not None:
+                logger.info("Audio callback thread: %s", rt_outcome)
+                rt_outcome = None
+            while ring_w - read >= CHUNK_SAMPLES:
+                behind = ring_w - read
+                if behind > RING_SAMPLES - CHUNK_SAMPLES:
+                    logger.warning("STT VAD worker fell %d ms behind; dropping audio", behind * 1000 // SAMPLE_RATE)
+                    read = ring_w - CHUNK_SAMPLES
+                pos = read % RING_SAMPLES
+                end = pos + CHUNK_SAMPLES
+                if end <= RING_SAMPLES:
+                    chunk[:] = ring[pos:end]
+                else:
+                    split = RING_SAMPLES - pos
+                    chunk[:split] = ring[pos:]
+                    chunk[split:] = ring[: end - RING_SAMPLES]
+                read += CHUNK_SAMPLES
+
+                now = time.monotonic()
+                if echo_guard.is_gated(now):
+                    write_off = 0
+                    speech_started = False
+                    silence_frames = 0
+                    speech_start_frames = 0
+                    utterance_start_ts = 0.0
+                    _reset_vad_state()
+                    continue
+                if HAS_SILERO:
+                    np.multiply(chunk, _INT16_SCALE, out=chunk_f32)
+                if _vad_session is not None:
+                    is_speech = _silero_onnx_prob(chunk_f32) >= SILERO_THRESHOLD
+                elif HAS_SILERO:
+                    ts = _get_speech_timestamps(
+                        torch.from_numpy(chunk_f32),
+                        _vad_model,
+                        sampling_rate=SAMPLE_RATE,
+                        threshold=SILERO_THRESHOLD,
+                        min_speech_duration_ms=100,
+                    )
+                    is_speech = bool(ts)
+                else:
+                    is_speech = _energy_vad(chunk)
+
+                if not speech_started:
+                    if is_speech:
+                        speech_start_frames += 1
+                        utter_buf[write_off:write_off + CHUNK_SAMPLES] = chunk
+                        write_off += CHUNK_SAMPLES
+                        if speech_start_frames * CHUNK_MS >= MIN_SPEECH_START_MS:
+                            speech_started = True
+                            utterance_start_ts = now
+                            silence_frames = 0
+                    else:
+                        write_off = 0
+                        speech_start_frames = 0
+                    continue
+
+                # speech_started == True
+                utter_buf[write_off:write_off + CHUNK_SAMPLES] = chunk
+                write_off += CHUNK_SAMPLES
+                if is_speech:
+                    silence_frames = 0
+                else:
+                    silence_frames += 1
+
+                elapsed_ms = int((now - utterance_start_ts) * 1000) if utterance_start_ts else 0
+                silence_reached = silence_frames * CHUNK_MS >= SILENCE_MS
+                max_reached = elapsed_ms >= MAX_UTTERANCE_MS or write_off + CHUNK_SAMPLES > UTTERANCE_BUF_SAMPLES
+                if silence_reached or max_reached:
+                    if max_reached and not silence_reached:
+                        logger.info("STT forcing utterance flush at max duration (%d ms)", elapsed_ms)
+                    # Copy out so the next utterance can reuse utter_buf while Whisper runs.
+                    to_process = utter_buf[:write_off].copy()
+                    write_off = 0
+                    speech_started = False
+                    silence_frames = 0
+                    speech_start_frames = 0
+                    utterance_start_ts = 0.0
+                    if len(to_process) >= int(MIN_UTTERANCE_MS / 1000 * SAMPLE_RATE):
+                        utterance_queue.put(to_process)
 
     stream = sd.InputStream(
         samplerate=SAMPLE_RATE,
         channels=1,
-        dtype="float32",
+        dtype="int16",
         blocksize=CHUNK_SAMPLES,
         device=input_device,
         callback=audio_callback,
     )
+    vad_thread = threading.Thread(target=vad_loop, name="stt-vad", daemon=True)
+    whisper_thread = threading.Thread(target=whisper_loop, name="stt-whisper", daemon=True)
+    whisper_thread.start()
+    vad_thread.start()
     stream.start()
     try:
         while True:
-            try:
-                item = await asyncio.wait_for(_transcript_queue.get(), timeout=0.5)
-                text, ts = item
-                if echo_guard.is_echo(text):
-                    logger.debug("Skipping echo transcript: %r", text[:50])
-                    continue
-                yield (text, ts)
-            except asyncio.TimeoutError:
+            text, ts = await queue.get()
+            if echo_guard.is_echo(text):
+                logger.debug("Skipping echo transcript: %r", text[:50])
                 continue
+            yield (text, ts)
     finally:
         stream.stop()
         stream.close()
+        stop.set()
+        data_ready.set()
+        vad_thread.join(timeout=1.0)
+        utterance_queue.put(None)
         _transcript_queue = None
 
 
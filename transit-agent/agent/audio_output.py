@@ -4,11 +4,22 @@ from __future__ import annotations
 
 import asyncio
 import logging
-import math
 import random
 import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import httpx
+import numpy as np
+
+try:
+    import miniaudio
+    import sounddevice as sd
+    HAS_MINIAUDIO = True
+except ImportError:
+    HAS_MINIAUDIO = False
+
 import config
 from agent import echo_guard
 from agent import display_server
@@ -23,8 +34,23 @@ _AUDIO_LEVEL_INTERVAL = 0.016
 _JITTER_INTERVAL = _AUDIO_LEVEL_INTERVAL * 6
 
 
+# Sustain envelope precomputed once per tick index (2048 ticks ≈ 33 s before it loops).
+_ENV_TABLE_SIZE = 2048
+_env_x = np.arange(_ENV_TABLE_SIZE, dtype=np.float64) * _AUDIO_LEVEL_INTERVAL
+_ENV_TABLE = (
+    0.6
+    + 0.06 * np.sin(_env_x * 2.3)
+    + 0.05 * np.sin(_env_x * 4.7)
+    + 0.04 * np.sin(_env_x * 6.1)
+    + 0.03 * np.sin(_env_x * 0.97)
+    + 0.07 * np.sin(_env_x * 9.2)
+).astype(np.float32).tolist()
+del _env_x
+
+
 async def _emit_audio_level_envelope(stop_event: asyncio.Event) -> None:
     """Send an irregular envelope (ramp then varying sustain). Higher rate + punchier curve reduce lethargic feel."""
+    idx = 0
     t = 0.0
     jitter = 0.0
     next_jitter_t = 0.0
@@ -35,16 +61,16 @@ async def _emit_audio_level_envelope(stop_event: asyncio.Event) -> None:
             if t >= next_jitter_t:
                 jitter = 0.10 * (2 * random.random() - 1)
                 next_jitter_t = t + _JITTER_INTERVAL
-            level = 0.6 + 0.06 * math.sin(t * 2.3) + 0.05 * math.sin(t * 4.7) + 0.04 * math.sin(t * 6.1)
-            level += 0.03 * math.sin(t * 0.97) + 0.07 * math.sin(t * 9.2)
-            level += jitter
+            level = _ENV_TABLE[idx % _ENV_TABLE_SIZE] + jitter
         level = max(0.0, min(1.0, level))
         await display_server.broadcast_audio_level(level)
         await asyncio.sleep(_AUDIO_LEVEL_INTERVAL)
-        t += _AUDIO_LEVEL_INTERVAL
+        idx += 1
+        t = idx * _AUDIO_LEVEL_INTERVAL
 
 
-_speak_queue: asyncio.Queue[tuple[str, asyncio.Future[None]]] | None = None
+_speak_queue: asyncio.Queue[tuple[object, asyncio.Future[None]]] | None = None
+_SHUTDOWN = object()  # queued by shutdown(); tells _speaker_loop to exit
 
 
 def _normalize_for_tts(text: str) -> str:
@@ -70,13 +96,35 @@ def _duration_ms_from_alignment(alignment: dict | None) -> int | None:
         return None
 
 
+ELEVENLABS_TTS_BASE = "https://api.elevenlabs.io/v1/text-to-speech"
+# Shared keep-alive client so each streamed sentence reuses the warm TLS connection to ElevenLabs.
+_client: httpx.AsyncClient | None = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=30.0,
+            limits=httpx.Limits(max_keepalive_connections=4, max_connections=8, keepalive_expiry=60.0),
+        )
+    return _client
+
+
+async def aclose_client() -> None:
+    """Close the shared ElevenLabs client (call on shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+
+
 async def _fetch_elevenlabs_with_timestamps(text: str) -> tuple[bytes, int | None]:
     """Fetch TTS from ElevenLabs with-timestamps endpoint. Returns (audio_bytes, duration_ms or None)."""
     if not config.ELEVENLABS_API_KEY or not config.ELEVENLABS_VOICE_ID:
         raise RuntimeError("ElevenLabs API key or voice ID not set")
     import base64
-    import httpx
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{config.ELEVENLABS_VOICE_ID}/with-timestamps"
+    url = f"{ELEVENLABS_TTS_BASE}/{config.ELEVENLABS_VOICE_ID}/with-timestamps"
     headers = {
         "xi-api-key": config.ELEVENLABS_API_KEY,
         "Content-Type": "application/json",
@@ -86,10 +134,9 @@ async def _fetch_elevenlabs_with_timestamps(text: str) -> tuple[bytes, int | Non
         "model_id": "eleven_monolingual_v1",
         "apply_text_normalization": "auto",
     }
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        r = await client.post(url, json=payload, headers=headers)
-        r.raise_for_status()
-        data = r.json()
+    r = await _get_client().post(url, json=payload, headers=headers)
+    r.raise_for_status()
+    data = r.json()
     audio_b64 = data.get("audio_base64")
     if not audio_b64:
         raise RuntimeError("ElevenLabs with-timestamps returned no audio_base64")
@@ -103,24 +150,85 @@ async def _fetch_elevenlabs_fallback(text: str) -> tuple[bytes, int | None]:
     """Fallback: regular TTS endpoint when with-timestamps fails. Returns (audio_bytes, None)."""
     if not config.ELEVENLABS_API_KEY or not config.ELEVENLABS_VOICE_ID:
         raise RuntimeError("ElevenLabs API key or voice ID not set")
-    import httpx
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{config.ELEVENLABS_VOICE_ID}"
+    url = f"{ELEVENLABS_TTS_BASE}/{config.ELEVENLABS_VOICE_ID}"
+    headers = {
+        "xi-api-key": config.ELEVENLABS_API_KEY,
+        "Content-Type": "application/json",
+        "Accept": "audio/mpeg",
+    }
+    r = await _get_client().post(url, json={"text": text, "model_id": "eleven_monolingual_v1"}, headers=headers)
+    r.raise_for_status()
+    return (r.content, None)
+
+
+async def _stream_elevenlabs_to_mpg123(text: str, on_first_chunk) -> None:
+    """Stream TTS from ElevenLabs /stream into mpg123 stdin so playback starts on the first chunk.
+    Raises if nothing was played (caller falls back to the buffered path); errors mid-stream just end playback."""
+    if not config.ELEVENLABS_API_KEY or not config.ELEVENLABS_VOICE_ID:
+        raise RuntimeError("ElevenLabs API key or voice ID not set")
+    url = f"{ELEVENLABS_TTS_BASE}/{config.ELEVENLABS_VOICE_ID}/stream"
+    params = {"optimize_streaming_latency": "3", "output_format": "mp3_22050_32"}
     headers = {
         "xi-api-key": config.ELEVENLABS_API_KEY,
         "Content-Type": "application/json",
         "Accept": "audio/mpeg",
     }
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        r = await client.post(url, json={"text": text, "model_id": "eleven_monolingual_v1"}, headers=headers)
-        r.raise_for_status()
-        return (r.content, None)
+    payload = {"text": text, "model_id": "eleven_monolingual_v1", "apply_text_normalization": "auto"}
+    proc = await asyncio.create_subprocess_exec(
+        "mpg123", "-q", "-",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    started = False
+    t0 = asyncio.get_event_loop().time()
+    try:
+        async with _get_client().stream("POST", url, params=params, json=payload, headers=headers) as r:
+            r.raise_for_status()
+            async for chunk in r.aiter_bytes(4096):
+                if not started:
+                    started = True
+                    logger.info("Latency TTS stream_first_chunk_ms=%d text_len=%d", int((asyncio.get_event_loop().time() - t0) * 1000), len(text))
+                    await on_first_chunk()
+                proc.stdin.write(chunk)
+                await proc.stdin.drain()
+        proc.stdin.close()
+        await proc.wait()
+    except Exception as e:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        if not started:
+            raise
+        logger.warning("TTS stream interrupted after playback started: %s", e)
+
+
+# Single worker for blocking playback (pyttsx3, miniaudio/sounddevice) so it never queues behind other executor work.
+_tts_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts")
+_PLAYBACK_RATE = 22050
+
+
+def _play_mp3_miniaudio(audio_bytes: bytes) -> None:
+    """Decode mp3 in-process with miniaudio and play through PortAudio; returns when playback ends."""
+    decoded = miniaudio.decode(
+        audio_bytes,
+        output_format=miniaudio.SampleFormat.FLOAT32,
+        nchannels=1,
+        sample_rate=_PLAYBACK_RATE,
+    )
+    samples = np.frombuffer(decoded.samples, dtype=np.float32)
+    sd.play(samples, _PLAYBACK_RATE, blocking=True)
 
 
 async def _play_audio_bytes(audio_bytes: bytes) -> None:
-    """Play audio bytes (mp3). Uses pygame or afplay fallback."""
+    """Play audio bytes (mp3). Uses miniaudio + sounddevice, else pygame, else afplay fallback."""
+    if HAS_MINIAUDIO:
+        await asyncio.get_event_loop().run_in_executor(_tts_executor, _play_mp3_miniaudio, audio_bytes)
+        return
     try:
         import pygame
-        pygame.mixer.init(frequency=22050, size=-16, channels=1)
+        if not pygame.mixer.get_init():
+            pygame.mixer.init(frequency=22050, size=-16, channels=1)
         snd = pygame.mixer.Sound(buffer=audio_bytes)
         snd.play()
         while pygame.mixer.get_busy():
@@ -145,12 +253,20 @@ async def _play_audio_bytes(audio_bytes: bytes) -> None:
                 pass
 
 
+# pyttsx3 engines aren't thread-safe: one engine, reused, driven only from the TTS thread.
+_PYTTS_ENGINE = None
+_PYTTS_LOCK = threading.Lock()
+
+
 def _play_pyttsx3(text: str) -> None:
-    """Synchronous pyttsx3 playback (run in executor)."""
-    import pyttsx3
-    engine = pyttsx3.init()
-    engine.say(text)
-    engine.runAndWait()
+    """Synchronous pyttsx3 playback (run in _tts_executor)."""
+    global _PYTTS_ENGINE
+    with _PYTTS_LOCK:
+        if _PYTTS_ENGINE is None:
+            import pyttsx3
+            _PYTTS_ENGINE = pyttsx3.init()
+        _PYTTS_ENGINE.say(text)
+        _PYTTS_ENGINE.runAndWait()
 
 
 async def play_local_file(file_path: str | Path) -> None:
@@ -193,28 +309,39 @@ async def speak(text: str) -> None:
     await done
 
 
-async def speak_nonblocking(text: str) -> None:
-    """Queue speech and return immediately without waiting for playback completion."""
+async def speak_nonblocking(text: str) -> asyncio.Future[None] | None:
+    """Queue speech and return immediately; the returned future resolves when this text has finished playing."""
     if not text or not text.strip():
-        return
+        return None
     global _speak_queue
     if _speak_queue is None:
         _speak_queue = asyncio.Queue()
         asyncio.create_task(_speaker_loop())
     done: asyncio.Future[None] = asyncio.get_event_loop().create_future()
     await _speak_queue.put((text, done))
+    return done
+
+
+async def shutdown() -> None:
+    """Stop the speaker loop after anything already queued has played."""
+    global _speak_queue
+    if _speak_queue is None:
+        return
+    done: asyncio.Future[None] = asyncio.get_event_loop().create_future()
+    await _speak_queue.put((_SHUTDOWN, done))
+    _speak_queue = None
+    await done
 
 
 async def _speaker_loop() -> None:
     """Dedicated loop that consumes the speak queue and plays TTS; completes future when done."""
-    global _speak_queue
     loop = asyncio.get_event_loop()
-    while _speak_queue is not None:
-        try:
-            item = await asyncio.wait_for(_speak_queue.get(), timeout=0.5)
-        except asyncio.TimeoutError:
-            continue
-        text, done = item
+    queue = _speak_queue
+    while True:
+        text, done = await queue.get()
+        if text is _SHUTDOWN:
+            done.set_result(None)
+            break
         text = _normalize_for_tts(text)
         if not text:
             if not done.done():
@@ -226,7 +353,18 @@ async def _speaker_loop() -> None:
         level_task = asyncio.create_task(_emit_audio_level_envelope(stop_level_event))
         turn_t0 = asyncio.get_event_loop().time()
         try:
-            if config.USE_ELEVENLABS:
+            streamed = False
+            if config.USE_ELEVENLABS and shutil.which("mpg123"):
+                t0 = asyncio.get_event_loop().time()
+                try:
+                    await _stream_elevenlabs_to_mpg123(
+                        text, lambda: display_server.send_layout("speaking", {"text": text})
+                    )
+                    streamed = True
+                    logger.info("Latency TTS stream_playback_ms=%d text_len=%d", int((asyncio.get_event_loop().time() - t0) * 1000), len(text))
+                except Exception as e:
+                    logger.warning("TTS streaming failed, falling back to buffered playback: %s", e)
+            if config.USE_ELEVENLABS and not streamed:
                 try:
                     t0 = asyncio.get_event_loop().time()
                     audio_bytes, duration_ms = await _fetch_elevenlabs_with_timestamps(text)
@@ -242,10 +380,10 @@ async def _speaker_loop() -> None:
                 t0 = asyncio.get_event_loop().time()
                 await _play_audio_bytes(audio_bytes)
                 logger.info("Latency TTS playback_ms=%d text_len=%d", int((asyncio.get_event_loop().time() - t0) * 1000), len(text))
-            else:
+            elif not config.USE_ELEVENLABS:
                 await display_server.send_layout("speaking", {"text": text})
                 t0 = asyncio.get_event_loop().time()
-                await loop.run_in_executor(None, _play_pyttsx3, text)
+                await loop.run_in_executor(_tts_executor, _play_pyttsx3, text)
                 logger.info("Latency TTS pyttsx3_playback_ms=%d text_len=%d", int((asyncio.get_event_loop().time() - t0) * 1000), len(text))
         except Exception as e:
             logger.exception("TTS playback failed: %s", e)
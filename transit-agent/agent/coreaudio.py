@@ -0,0 +1,112 @@
+"""Minimal ctypes binding to macOS CoreAudio: list output devices and set the system default output.
+Lets spotify_client route audio in-process instead of spawning SwitchAudioSource. AVAILABLE is False off macOS."""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+
+_SYSTEM_OBJECT = 1  # kAudioObjectSystemObject
+_ELEMENT_MAIN = 0  # kAudioObjectPropertyElementMain
+_CF_STRING_ENCODING_UTF8 = 0x08000100
+
+
+def _fourcc(code: str) -> int:
+    return int.from_bytes(code.encode("ascii"), "big")
+
+
+_PROP_DEVICES = _fourcc("dev#")  # kAudioHardwarePropertyDevices
+_PROP_DEFAULT_OUTPUT = _fourcc("dOut")  # kAudioHardwarePropertyDefaultOutputDevice
+_PROP_NAME = _fourcc("lnam")  # kAudioObjectPropertyName
+_PROP_STREAMS = _fourcc("stm#")  # kAudioDevicePropertyStreams
+_SCOPE_GLOBAL = _fourcc("glob")
+_SCOPE_OUTPUT = _fourcc("outp")
+
+
+class _PropertyAddress(ctypes.Structure):
+    _fields_ = [("selector", ctypes.c_uint32), ("scope", ctypes.c_uint32), ("element", ctypes.c_uint32)]
+
+
+try:
+    _ca = ctypes.CDLL(ctypes.util.find_library("CoreAudio") or "CoreAudio")
+    _cf = ctypes.CDLL(ctypes.util.find_library("CoreFoundation") or "CoreFoundation")
+    _addr_p = ctypes.POINTER(_PropertyAddress)
+    _u32_p = ctypes.POINTER(ctypes.c_uint32)
+    _ca.AudioObjectGetPropertyDataSize.argtypes = [ctypes.c_uint32, _addr_p, ctypes.c_uint32, ctypes.c_void_p, _u32_p]
+    _ca.AudioObjectGetPropertyData.argtypes = [ctypes.c_uint32, _addr_p, ctypes.c_uint32, ctypes.c_void_p, _u32_p, ctypes.c_void_p]
+    _ca.AudioObjectSetPropertyData.argtypes = [ctypes.c_uint32, _addr_p, ctypes.c_uint32, ctypes.c_void_p, ctypes.c_uint32, ctypes.c_void_p]
+    _cf.CFStringGetCString.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_long, ctypes.c_uint32]
+    _cf.CFStringGetCString.restype = ctypes.c_bool
+    _cf.CFRelease.argtypes = [ctypes.c_void_p]
+    AVAILABLE = True
+except (OSError, AttributeError):
+    AVAILABLE = False
+
+# Output device name -> AudioDeviceID; rescanned when a name is missing or setting it fails.
+_device_ids: dict[str, int] = {}
+
+
+def _check(status: int, what: str) -> None:
+    if status != 0:
+        raise OSError(f"CoreAudio {what} failed (OSStatus {status})")
+
+
+def _data_size(obj: int, addr: _PropertyAddress) -> int:
+    size = ctypes.c_uint32(0)
+    _check(_ca.AudioObjectGetPropertyDataSize(obj, ctypes.byref(addr), 0, None, ctypes.byref(size)), "GetPropertyDataSize")
+    return size.value
+
+
+def _device_name(device_id: int) -> str:
+    addr = _PropertyAddress(_PROP_NAME, _SCOPE_GLOBAL, _ELEMENT_MAIN)
+    cfstr = ctypes.c_void_p()
+    size = ctypes.c_uint32(ctypes.sizeof(cfstr))
+    _check(_ca.AudioObjectGetPropertyData(device_id, ctypes.byref(addr), 0, None, ctypes.byref(size), ctypes.byref(cfstr)), "GetPropertyData(name)")
+    try:
+        buf = ctypes.create_string_buffer(512)
+        if not _cf.CFStringGetCString(cfstr, buf, len(buf), _CF_STRING_ENCODING_UTF8):
+            return ""
+        return buf.value.decode("utf-8")
+    finally:
+        _cf.CFRelease(cfstr)
+
+
+def _scan_output_devices() -> dict[str, int]:
+    """Name -> AudioDeviceID for every device with at least one output stream."""
+    addr = _PropertyAddress(_PROP_DEVICES, _SCOPE_GLOBAL, _ELEMENT_MAIN)
+    size = _data_size(_SYSTEM_OBJECT, addr)
+    count = size // ctypes.sizeof(ctypes.c_uint32)
+    ids = (ctypes.c_uint32 * count)()
+    io_size = ctypes.c_uint32(size)
+    _check(_ca.AudioObjectGetPropertyData(_SYSTEM_OBJECT, ctypes.byref(addr), 0, None, ctypes.byref(io_size), ids), "GetPropertyData(devices)")
+    streams = _PropertyAddress(_PROP_STREAMS, _SCOPE_OUTPUT, _ELEMENT_MAIN)
+    out: dict[str, int] = {}
+    for device_id in ids:
+        if _data_size(device_id, streams) > 0:
+            out[_device_name(device_id)] = device_id
+    return out
+
+
+def output_device_names() -> list[str]:
+    """Names of the current output devices (rescans)."""
+    global _device_ids
+    _device_ids = _scan_output_devices()
+    return list(_device_ids)
+
+
+def set_default_output(name: str) -> bool:
+    """Make the output device called `name` the system default. False if no such device; OSError on CoreAudio errors."""
+    global _device_ids
+    device_id = _device_ids.get(name)
+    if device_id is None:
+        _device_ids = _scan_output_devices()
+        device_id = _device_ids.get(name)
+        if device_id is None:
+            return False
+    addr = _PropertyAddress(_PROP_DEFAULT_OUTPUT, _SCOPE_GLOBAL, _ELEMENT_MAIN)
+    value = ctypes.c_uint32(device_id)
+    status = _ca.AudioObjectSetPropertyData(_SYSTEM_OBJECT, ctypes.byref(addr), 0, None, ctypes.sizeof(value), ctypes.byref(value))
+    if status != 0:
+        _device_ids = {}  # the id may be stale (device unplugged and replugged); rescan next time
+    _check(status, "SetPropertyData(default output)")
+    return True
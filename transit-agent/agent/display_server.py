@@ -5,30 +5,93 @@ from __future__ import annotations
 import asyncio
 
 import config
-import json
 import logging
+import struct
 from typing import Any
 
 import websockets
 from websockets.server import WebSocketServerProtocol
 
+from agent import json_codec
+
+# Optional: msgspec encodes the fixed {layout, data} envelope through a compiled Struct encoder.
+try:
+    import msgspec
+
+    class LayoutMsg(msgspec.Struct):
+        layout: str
+        data: dict[str, Any]
+
+    _layout_encoder = msgspec.json.Encoder()
+
+    def _encode_layout(layout: str, data: dict[str, Any]) -> str:
+        return _layout_encoder.encode(LayoutMsg(layout, data)).decode()
+except ImportError:
+    def _encode_layout(layout: str, data: dict[str, Any]) -> str:
+        return json_codec.dumps({"layout": layout, "data": data})
+
 logger = logging.getLogger(__name__)
-_clients: set[WebSocketServerProtocol] = set()
+
+# Each client gets a bounded outbound queue drained by its own sender task, so one slow
+# client never delays the others. Audio levels are dropped when a queue is full.
+_CLIENT_QUEUE_SIZE = 8
+_clients: dict[WebSocketServerProtocol, asyncio.Queue[str | bytes]] = {}
+_sender_tasks: dict[WebSocketServerProtocol, asyncio.Task[None]] = {}
 _client_connected_event: asyncio.Event | None = None
 _last_layout: str | None = None
 _last_data: dict[str, Any] | None = None
+# Encoded form of the last layout; reused when an identical layout is pushed again.
+_last_serialized_msg: str | None = None
+
+# Layout broadcasts are throttled leading-edge: the first goes out at once, anything pushed within the next
+# _LAYOUT_MIN_INTERVAL_SEC is coalesced and only the latest is sent when the window ends.
+_LAYOUT_MIN_INTERVAL_SEC = 0.05
+_last_broadcast_at = 0.0
+_pending_msg: str | None = None
+_flush_handle: asyncio.TimerHandle | None = None
+
+# Audio level goes out as a 5-byte binary frame: tag byte + little-endian float32. Layouts stay JSON text frames.
+_LEVEL_TAG = b"\x01"
+_LEVEL_STRUCT = struct.Struct("<f")
+
+
+async def _sender(ws: WebSocketServerProtocol, queue: asyncio.Queue[str | bytes]) -> None:
+    """Drain one client's queue onto its socket until the connection goes away."""
+    while True:
+        msg = await queue.get()
+        try:
+            await ws.send(msg)
+        except Exception:
+            return
+
+
+def _enqueue(queue: asyncio.Queue[str | bytes], msg: str | bytes, droppable: bool = False) -> None:
+    """Queue msg without blocking. Droppable messages are skipped when full; others evict the oldest
+    queued audio-level frame, falling back to the oldest entry only when no level frame is queued."""
+    if droppable and queue.full():
+        return
+    try:
+        queue.put_nowait(msg)
+    except asyncio.QueueFull:
+        pending = queue._queue  # asyncio.Queue's backing deque
+        for i, queued in enumerate(pending):
+            if isinstance(queued, bytes):
+                del pending[i]
+                break
+        else:
+            queue.get_nowait()
+        queue.put_nowait(msg)
 
 
 async def register(ws: WebSocketServerProtocol) -> None:
-    _clients.add(ws)
+    queue: asyncio.Queue[str | bytes] = asyncio.Queue(maxsize=_CLIENT_QUEUE_SIZE)
+    _clients[ws] = queue
+    _sender_tasks[ws] = asyncio.create_task(_sender(ws, queue))
     if _client_connected_event is not None:
         _client_connected_event.set()
     # Send current state immediately so new clients get ride data (next_stop, eta) without waiting for the next message
-    if _last_layout is not None and _last_data is not None:
-        try:
-            await ws.send(json.dumps({"layout": _last_layout, "data": _last_data}))
-        except Exception:
-            pass
+    if _last_serialized_msg is not None:
+        _enqueue(queue, _last_serialized_msg)
     logger.info("Display client connected (total=%d)", len(_clients))
 
 
@@ -47,7 +110,10 @@ async def wait_for_client(timeout: float = 2.0) -> bool:
 
 
 async def unregister(ws: WebSocketServerProtocol) -> None:
-    _clients.discard(ws)
+    _clients.pop(ws, None)
+    task = _sender_tasks.pop(ws, None)
+    if task is not None:
+        task.cancel()
     logger.info("Display client disconnected (total=%d)", len(_clients))
 
 
@@ -55,29 +121,51 @@ async def broadcast_audio_level(level: float) -> None:
     """Broadcast audio level (0.0–1.0) to all connected display clients for presence animation."""
     if not _clients:
         return
-    msg = json.dumps({"type": "audio_level", "value": level})
-    await asyncio.gather(
-        *[client.send(msg) for client in _clients],
-        return_exceptions=True,
-    )
+    msg = _LEVEL_TAG + _LEVEL_STRUCT.pack(level)
+    for queue in _clients.values():
+        _enqueue(queue, msg, droppable=True)
+
+
+def _broadcast_layout(msg: str) -> None:
+    global _last_broadcast_at
+    _last_broadcast_at = asyncio.get_running_loop().time()
+    for queue in _clients.values():
+        _enqueue(queue, msg)
+
+
+def _flush_pending() -> None:
+    global _pending_msg, _flush_handle
+    _flush_handle = None
+    if _pending_msg is not None:
+        msg, _pending_msg = _pending_msg, None
+        _broadcast_layout(msg)
 
 
 async def send_layout(layout: str, data: dict[str, Any]) -> None:
-    """Push a layout and its data to all connected display clients. Stores state for late-joining clients."""
-    global _last_layout, _last_data
-    _last_layout = layout
-    _last_data = data
-    msg = json.dumps({"layout": layout, "data": data})
+    """Push a layout and its data to all connected display clients. Stores state for late-joining clients.
+    Bursts within _LAYOUT_MIN_INTERVAL_SEC collapse to the latest layout."""
+    global _last_layout, _last_data, _last_serialized_msg, _pending_msg, _flush_handle
+    if _last_serialized_msg is not None and layout == _last_layout and data == _last_data:
+        msg = _last_serialized_msg
+    else:
+        msg = _encode_layout(layout, data)
+        _last_layout = layout
+        _last_data = dict(data)  # shallow copy so callers mutating their dict can't fake a cache hit
+        _last_serialized_msg = msg
     if not _clients:
         logger.debug("No display clients; message dropped: %s", layout)
         return
     if layout == "speaking":
         text_preview = (data.get("text") or "")[:60]
         logger.info("Display send_layout speaking: %s", text_preview + ("..." if len(data.get("text") or "") > 60 else ""))
-    await asyncio.gather(
-        *[client.send(msg) for client in _clients],
-        return_exceptions=True,
-    )
+    loop = asyncio.get_running_loop()
+    wait = _last_broadcast_at + _LAYOUT_MIN_INTERVAL_SEC - loop.time()
+    if wait <= 0 and _flush_handle is None:
+        _broadcast_layout(msg)
+        return
+    _pending_msg = msg
+    if _flush_handle is None:
+        _flush_handle = loop.call_later(max(wait, 0.0), _flush_pending)
 
 
 async def handler(ws: WebSocketServerProtocol, path: str | None = None) -> None:
@@ -3,20 +3,44 @@
 # All audio_input.py and main.py gating goes through this module.
 # See ECHO_GUARD.md for usage.
 
+from __future__ import annotations
+
+import heapq
+import re
 import time
 from difflib import SequenceMatcher
 
+try:
+    from rapidfuzz import fuzz  # bit-parallel C implementation of the same similarity ratio
+except ImportError:
+    fuzz = None
+
 # --- Config ---
 
 HOLDOFF_SECONDS = 0.45  # silence window kept after TTS ends (tune per cabin)
 ECHO_THRESHOLD = 0.70  # similarity ratio above which a transcript is discarded
 RECENT_SPEECH_WINDOW = 5  # number of recent utterances to check against
+SHINGLE_PREFILTER = 0.25  # estimated 4-shingle Jaccard below which the full ratio is skipped
+SKETCH_SIZE = 64  # bottom-k hashes kept per text; Jaccard estimate cost is O(SKETCH_SIZE)
+WORD_OVERLAP_MIN = 0.5  # share of transcript words that must appear in the utterance to run the ratio
+
+# Words for the overlap prefilter; punctuation is dropped since Whisper and the TTS text differ mostly in it
+_WORD = re.compile(r"\w+")
 
 # --- State ---
 
-_is_speaking: bool = False
-_holdoff_until: float = 0.0
-_recent_utterances: list[str] = []  # rolling window of recent agent speech
+class _State:
+    """Gate state read by the VAD worker on every chunk; slots keep the lookups cheap."""
+
+    __slots__ = ("speaking", "holdoff_until")
+
+    def __init__(self) -> None:
+        self.speaking = False
+        self.holdoff_until = 0.0
+
+
+_state = _State()
+_recent_utterances: list[tuple[str, frozenset[int], frozenset[str]]] = []  # (recent agent speech, sketch, words)
 
 
 # --- Gate API ---
@@ -26,33 +50,56 @@ def set_speaking(active: bool, holdoff: bool = True) -> None:
     Called by audio_output when TTS starts and ends.
     When ending (active=False), starts the holdoff timer.
     """
-    global _is_speaking, _holdoff_until
-    _is_speaking = active
+    _state.speaking = active
     if not active and holdoff:
-        _holdoff_until = time.monotonic() + HOLDOFF_SECONDS
+        _state.holdoff_until = time.monotonic() + HOLDOFF_SECONDS
 
 
-def is_gated() -> bool:
+def is_gated(now: float | None = None) -> bool:
     """
     Returns True if audio input should be discarded.
     Covers both active TTS and the post-speech holdoff window.
+    Pass now=time.monotonic() when the caller already has it.
     """
-    if _is_speaking:
+    state = _state
+    if state.speaking:
         return True
-    if time.monotonic() < _holdoff_until:
-        return True
-    return False
+    return (time.monotonic() if now is None else now) < state.holdoff_until
 
 
 # --- Transcript similarity check ---
 
+def _sketch(text: str) -> frozenset[int]:
+    """Bottom-k sketch: the SKETCH_SIZE smallest hashes of the text's character 4-shingles."""
+    shingles = {hash(text[i:i + 4]) for i in range(len(text) - 3)}
+    if len(shingles) <= SKETCH_SIZE:
+        return frozenset(shingles)
+    return frozenset(heapq.nsmallest(SKETCH_SIZE, shingles))
+
+
+def _jaccard_estimate(a: frozenset[int], b: frozenset[int]) -> float:
+    """Jaccard estimate from two bottom-k sketches (exact when both texts are short)."""
+    union_k = heapq.nsmallest(SKETCH_SIZE, a | b)
+    if not union_k:
+        return 0.0
+    return sum(1 for h in union_k if h in a and h in b) / len(union_k)
+
+
+def _ratio(a: str, b: str) -> float:
+    """Similarity ratio in [0, 1] (rapidfuzz when installed, else difflib)."""
+    if fuzz is not None:
+        return fuzz.ratio(a, b, score_cutoff=ECHO_THRESHOLD * 100) / 100
+    return SequenceMatcher(None, a, b).ratio()
+
+
 def register_utterance(text: str) -> None:
     """
     Call this every time Clyde speaks. Stores the utterance
     for echo detection on incoming transcripts.
     """
     global _recent_utterances
-    _recent_utterances.append(text.lower().strip())
+    t = text.lower().strip()
+    _recent_utterances.append((t, _sketch(t), frozenset(_WORD.findall(t))))
     if len(_recent_utterances) > RECENT_SPEECH_WINDOW:
         _recent_utterances.pop(0)
 
@@ -66,15 +113,27 @@ def is_echo(transcript: str) -> bool:
         return False
 
     t = transcript.lower().strip()
+    t_sketch = _sketch(t)
+    t_words = frozenset(_WORD.findall(t))
+    lt = len(t)
 
-    for utterance in _recent_utterances:
-        ratio = SequenceMatcher(None, t, utterance).ratio()
-        if ratio >= ECHO_THRESHOLD:
+    for utterance, u_sketch, u_words in _recent_utterances:
+        # Check if transcript is a substring of a recent utterance
+        # (catches partial captures at the start/end of TTS playback)
+        if lt > 8 and t in utterance:
             return True
 
-        # Also check if transcript is a substring of a recent utterance
-        # (catches partial captures at the start/end of TTS playback)
-        if len(t) > 8 and t in utterance:
+        # ratio = 2*matches/(la+lb) can't exceed 2*min/(la+lb): skip pairs whose lengths alone rule it out
+        lu = len(utterance)
+        if 2 * min(lt, lu) < ECHO_THRESHOLD * (lt + lu):
+            continue
+        if t_words and len(t_words & u_words) < WORD_OVERLAP_MIN * len(t_words):
+            continue
+
+        # Cheap sketch overlap first; only near matches pay for the full ratio
+        if (t_sketch or u_sketch) and _jaccard_estimate(t_sketch, u_sketch) < SHINGLE_PREFILTER:
+            continue
+        if _ratio(t, utterance) >= ECHO_THRESHOLD:
             return True
 
     return False
@@ -82,7 +141,7 @@ def is_echo(transcript: str) -> bool:
 
 def clear() -> None:
     """Reset all state — call at the start of each new ride session."""
-    global _is_speaking, _holdoff_until, _recent_utterances
-    _is_speaking = False
-    _holdoff_until = 0.0
+    global _recent_utterances
+    _state.speaking = False
+    _state.holdoff_until = 0.0
     _recent_utterances = []
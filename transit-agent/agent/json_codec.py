@@ -0,0 +1,43 @@
+"""JSON encode/decode. Uses orjson when installed (much faster on hot paths); stdlib json fallback."""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+try:
+    import orjson
+
+    _ORJSON_OPTS = orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps_bytes(obj: Any) -> bytes:
+        """Compact JSON as UTF-8 bytes."""
+        return orjson.dumps(obj, option=_ORJSON_OPTS)
+
+    def dumps(obj: Any) -> str:
+        """Compact JSON as str."""
+        return orjson.dumps(obj, option=_ORJSON_OPTS).decode()
+
+    def dumps_sorted(obj: Any) -> str:
+        """Compact JSON with sorted keys (stable cache keys)."""
+        return orjson.dumps(obj, option=_ORJSON_OPTS | orjson.OPT_SORT_KEYS).decode()
+
+    loads = orjson.loads
+    HAS_ORJSON = True
+except ImportError:
+    _SEPARATORS = (",", ":")
+
+    def dumps_bytes(obj: Any) -> bytes:
+        """Compact JSON as UTF-8 bytes."""
+        return json.dumps(obj, separators=_SEPARATORS, ensure_ascii=False).encode()
+
+    def dumps(obj: Any) -> str:
+        """Compact JSON as str."""
+        return json.dumps(obj, separators=_SEPARATORS, ensure_ascii=False)
+
+    def dumps_sorted(obj: Any) -> str:
+        """Compact JSON with sorted keys (stable cache keys)."""
+        return json.dumps(obj, separators=_SEPARATORS, ensure_ascii=False, sort_keys=True)
+
+    loads = json.loads
+    HAS_ORJSON = False
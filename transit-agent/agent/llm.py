@@ -3,16 +3,30 @@
 from __future__ import annotations
 
 import asyncio
-import json
+import contextlib
 import logging
+import os
+import re
 import shutil
-from typing import Any, Awaitable, Callable
+import tempfile
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Any, AsyncIterator, Awaitable, Callable
 
+import aiohttp
 import anthropic
 import httpx
 
+try:
+    import h2  # noqa: F401  (httpx[http2])
+    HAS_H2 = True
+except ImportError:
+    HAS_H2 = False
+
 from agent.context import RideContext
 from agent import display_server
+from agent import json_codec
 from agent import spotify_client
 import config
 
@@ -20,7 +34,8 @@ logger = logging.getLogger(__name__)
 
 VEHICLE_BASE = f"http://127.0.0.1:{config.VEHICLE_API_PORT}"
 
-TOOLS = [
+# Tool schemas never change at runtime; one immutable tuple is passed to every request.
+TOOLS: tuple[dict[str, Any], ...] = (
     {
         "name": "set_lights",
         "description": "Set cabin lighting brightness (0-100) and color temperature (warm, neutral, cool).",
@@ -121,14 +136,12 @@ TOOLS = [
             "required": ["sport"],
         },
     },
-]
-
-SYSTEM_PROMPT_TEMPLATE = """You are the in-cabin voice assistant for a small autonomous public transit vehicle. You are calm, brief, and co-pilot in tone. Keep responses to 2 sentences max unless the user asks for more. Your replies are spoken aloud; use minimal punctuation so the voice does not pause or read punctuation oddly. Do not ask follow-up questions unless strictly necessary. Do not volunteer what you can do or list your capabilities (e.g. "I can also adjust lights or play music") unless the user explicitly asks. When you take an action (lights, climate, audio), confirm briefly in speech and use send_display to push a status card.
-
-Current ride context (JSON):
-{context_json}
+)
+# Prompt-cache breakpoint on the last tool: the whole tools block is cached on its own, even if the system blocks change.
+TOOLS = (*TOOLS[:-1], {**TOOLS[-1], "cache_control": {"type": "ephemeral"}})
 
-Proactive offers already made this ride (do not repeat these): {offers_made}
+# Static instructions: identical every turn, sent first with cache_control so tools + rules hit the prompt cache.
+SYSTEM_PROMPT_RULES = """You are the in-cabin voice assistant for a small autonomous public transit vehicle. You are calm, brief, and co-pilot in tone. Keep responses to 2 sentences max unless the user asks for more. Your replies are spoken aloud; use minimal punctuation so the voice does not pause or read punctuation oddly. Do not ask follow-up questions unless strictly necessary. Do not volunteer what you can do or list your capabilities (e.g. "I can also adjust lights or play music") unless the user explicitly asks. When you take an action (lights, climate, audio), confirm briefly in speech and use send_display to push a status card.
 
 When taking an action, always call send_display with layout "status" and a short title/detail so the passenger sees confirmation on the display.
 
@@ -143,21 +156,168 @@ Important: After every tool call you must reply with at least one short spoken s
 
 Accuracy: Your spoken reply must match the actual tool result. If a tool returns an "error" or a "note" (e.g. no stream configured, Spotify not connected), do not claim success. Say what the tool reported in one short sentence (e.g. "Spotify isn't connected — open the cabin display to hear music there." or "Cabin audio isn't set up for streaming; I've updated the display.")."""
 
+# Per-turn block after the cached rules. Split once around the two slots so assembly is a plain join.
+SYSTEM_PROMPT_CONTEXT_TEMPLATE = """Current ride context (JSON):
+{context_json}
+
+Proactive offers already made this ride (do not repeat these): {offers_made}"""
+_PROMPT_PRE, _rest = SYSTEM_PROMPT_CONTEXT_TEMPLATE.split("{context_json}", 1)
+_PROMPT_MID, _PROMPT_SUF = _rest.split("{offers_made}", 1)
+del _rest
+
+_SYSTEM_RULES_BLOCK: dict[str, Any] = {
+    "type": "text",
+    "text": SYSTEM_PROMPT_RULES,
+    "cache_control": {"type": "ephemeral"},
+}
+
 
 # Open-Meteo: no API key, free
 GEOCODE_URL = "https://geocoding-api.open-meteo.com/v1/search"
 WEATHER_URL = "https://api.open-meteo.com/v1/forecast"
 
+# Long-lived HTTP clients (keep-alive + pooled connections); created on first use, closed by aclose_clients().
+# External APIs (weather, flights, scores) share one aiohttp session, which has lower per-request overhead
+# than httpx under concurrency; the vehicle API keeps a small httpx client with base_url.
+_SESSION: aiohttp.ClientSession | None = None
+_vehicle_client: httpx.AsyncClient | None = None
+_EXTERNAL_TIMEOUT = aiohttp.ClientTimeout(total=10)
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """Shared aiohttp session for outbound calls to external APIs."""
+    global _SESSION
+    if _SESSION is None or _SESSION.closed:
+        _SESSION = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=8),
+            connector=aiohttp.TCPConnector(limit=100, keepalive_timeout=30),
+        )
+    return _SESSION
+
+
+def get_vehicle_client() -> httpx.AsyncClient:
+    """Shared keep-alive client for the vehicle API (tool calls and main's /state reads)."""
+    global _vehicle_client
+    if _vehicle_client is None:
+        _vehicle_client = httpx.AsyncClient(
+            base_url=VEHICLE_BASE,
+            timeout=5.0,
+            limits=httpx.Limits(max_keepalive_connections=8, max_connections=16),
+        )
+    return _vehicle_client
+
+
+async def close_vehicle_client() -> None:
+    global _vehicle_client
+    if _vehicle_client is not None:
+        await _vehicle_client.aclose()
+    _vehicle_client = None
+
+
+async def aclose_clients() -> None:
+    """Close the shared HTTP clients (including Spotify's) and the persistent music player (call on shutdown)."""
+    global _SESSION, _anthropic_client
+    if _SESSION is not None:
+        await _SESSION.close()
+    await close_vehicle_client()
+    await spotify_client.aclose()
+    if _anthropic_client is not None:
+        await _anthropic_client.close()
+    _SESSION = None
+    _anthropic_client = None
+    _stop_mpv()
+
+
 # WMO weather codes -> short description (subset)
-WMO_CODES = {
+WMO_CODES = MappingProxyType({
     0: "clear", 1: "mainly clear", 2: "partly cloudy", 3: "overcast",
     45: "foggy", 48: "foggy", 51: "drizzle", 61: "light rain", 63: "rain", 65: "heavy rain",
     71: "snow", 73: "snow", 75: "heavy snow", 80: "rain showers", 81: "rain showers", 82: "heavy rain showers",
     95: "thunderstorm", 96: "thunderstorm with hail",
-}
+})
+
+
+# TTL caches: geocoding keyed by normalized name, current conditions by coords rounded to ~1 km.
+# Values are (expires_at_monotonic, payload); only successful lookups are stored. LRU-bounded.
+_GEO_TTL_SEC = 24 * 3600
+_WX_TTL_SEC = 10 * 60
+_GEO_CACHE_MAX = 128
+_CACHE_MAX = 256
+_geo_cache: OrderedDict[str, tuple[float, tuple[float, float, str]]] = OrderedDict()
+_wx_cache: OrderedDict[tuple[float, float], tuple[float, dict]] = OrderedDict()
+
+
+def _cache_get(cache: OrderedDict, key: Any) -> Any:
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    if entry[0] < time.monotonic():
+        del cache[key]
+        return None
+    cache.move_to_end(key)
+    return entry[1]
+
+
+def _cache_put(cache: OrderedDict, key: Any, value: Any, ttl: float, maxsize: int = _CACHE_MAX) -> None:
+    cache[key] = (time.monotonic() + ttl, value)
+    cache.move_to_end(key)
+    while len(cache) > maxsize:
+        cache.popitem(last=False)
+
+
+# Singleflight: concurrent lookups for the same location share one in-flight task.
+_weather_inflight: dict[str, asyncio.Task[dict]] = {}
 
 
 async def _fetch_weather(location: str) -> dict:
+    """Current weather for location (already stripped); identical concurrent requests await the same lookup."""
+    key = location.lower()
+    task = _weather_inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(_fetch_weather_uncoalesced(location))
+        _weather_inflight[key] = task
+        task.add_done_callback(lambda _t: _weather_inflight.pop(key, None))
+    # shield: one caller being cancelled must not cancel the lookup the others are waiting on
+    return await asyncio.shield(task)
+
+
+async def _geocode(session: aiohttp.ClientSession, name: str) -> tuple[float, float, str] | None:
+    """(lat, lon, canonical name) for a place name via Open-Meteo geocoding; None if not found."""
+    geo_key = name.lower()
+    geo = _cache_get(_geo_cache, geo_key)
+    if geo is None:
+        async with session.get(GEOCODE_URL, params={"name": name, "count": 1}) as r:
+            r.raise_for_status()
+            data = await r.json(loads=json_codec.loads)
+        results = data.get("results") or []
+        if not results:
+            return None
+        geo = (results[0]["latitude"], results[0]["longitude"], results[0].get("name", name))
+        _cache_put(_geo_cache, geo_key, geo, _GEO_TTL_SEC, _GEO_CACHE_MAX)
+    return geo
+
+
+# (lowercased name, (lat, lon, canonical name)) for WEATHER_DEFAULT_LOCATION, resolved once at startup so
+# the default-location question is a single forecast request. Not subject to the geocode cache TTL/eviction.
+_DEFAULT_LOCATION_COORDS: tuple[str, tuple[float, float, str]] | None = None
+
+
+async def warm_default_location() -> None:
+    """Geocode WEATHER_DEFAULT_LOCATION ahead of the first weather question (call once at startup)."""
+    global _DEFAULT_LOCATION_COORDS
+    name = config.WEATHER_DEFAULT_LOCATION.strip()
+    if not name or "," in name:  # empty, or already "lat,lon"
+        return
+    try:
+        geo = await _geocode(await get_session(), name)
+    except Exception as e:
+        logger.warning("Default weather location lookup failed: %s", e)
+        return
+    if geo is not None:
+        _DEFAULT_LOCATION_COORDS = (name.lower(), geo)
+
+
+async def _fetch_weather_uncoalesced(location: str) -> dict:
     """Resolve location to lat/lon (Open-Meteo geocoding), then fetch current weather."""
     lat, lon = None, None
     if location and "," in location:
@@ -167,38 +327,38 @@ async def _fetch_weather(location: str) -> dict:
                 lat, lon = float(parts[0].strip()), float(parts[1].strip())
             except ValueError:
                 pass
+    session = await get_session()
     if lat is None:
-        async with httpx.AsyncClient(timeout=8.0) as client:
-            r = await client.get(GEOCODE_URL, params={"name": location or config.WEATHER_DEFAULT_LOCATION, "count": 1})
-            r.raise_for_status()
-            data = r.json()
-        results = data.get("results") or []
-        if not results:
+        name = location or config.WEATHER_DEFAULT_LOCATION.strip()
+        if _DEFAULT_LOCATION_COORDS is not None and name.lower() == _DEFAULT_LOCATION_COORDS[0]:
+            geo = _DEFAULT_LOCATION_COORDS[1]
+        else:
+            geo = await _geocode(session, name)
+        if geo is None:
             return {"error": f"Could not find location: {location}"}
-        lat = results[0]["latitude"]
-        lon = results[0]["longitude"]
-        location = results[0].get("name", location)
-    async with httpx.AsyncClient(timeout=8.0) as client:
-        r = await client.get(
+        lat, lon, location = geo
+    wx_key = (round(lat, 2), round(lon, 2))
+    cur = _cache_get(_wx_cache, wx_key)
+    if cur is None:
+        async with session.get(
             WEATHER_URL,
             params={
                 "latitude": lat,
                 "longitude": lon,
                 "current": "temperature_2m,relative_humidity_2m,weather_code,wind_speed_10m",
             },
-        )
-        r.raise_for_status()
-        data = r.json()
-    cur = data.get("current") or {}
+        ) as r:
+            r.raise_for_status()
+            data = await r.json(loads=json_codec.loads)
+        cur = data.get("current") or {}
+        if cur:
+            _cache_put(_wx_cache, wx_key, cur, _WX_TTL_SEC)
     temp_c = cur.get("temperature_2m")
-    code = cur.get("weather_code", 0)
-    desc = WMO_CODES.get(code, "conditions")
-    temp_f = round((temp_c * 9 / 5) + 32) if temp_c is not None else None
     return {
         "location": location,
-        "temperature_f": temp_f,
+        "temperature_f": round(temp_c * 1.8 + 32) if temp_c is not None else None,
         "temperature_c": temp_c,
-        "conditions": desc,
+        "conditions": WMO_CODES.get(cur.get("weather_code", 0), "conditions"),
         "humidity_percent": cur.get("relative_humidity_2m"),
         "wind_kmh": cur.get("wind_speed_10m"),
     }
@@ -206,7 +366,7 @@ async def _fetch_weather(location: str) -> dict:
 
 # AviationStack: optional API key, free tier 100 req/month
 FLIGHT_API_URL = "https://api.aviationstack.com/v1/flights"
-AIRLINE_NAME_TO_IATA = {
+AIRLINE_NAME_TO_IATA = MappingProxyType({
     "united": "UA",
     "american": "AA",
     "delta": "DL",
@@ -216,16 +376,16 @@ AIRLINE_NAME_TO_IATA = {
     "spirit": "NK",
     "frontier": "F9",
     "allegiant": "G4",
-}
+})
 
 
 def _airline_to_iata(airline: str) -> str:
     """Convert airline name or IATA code to 2-letter IATA code for API."""
-    s = (airline or "").strip().upper()
+    stripped = (airline or "").strip()
+    s = stripped.upper()
     if len(s) == 2 and s.isalpha():
         return s
-    key = (airline or "").strip().lower()
-    return AIRLINE_NAME_TO_IATA.get(key, s[:2] if len(s) >= 2 else s)
+    return AIRLINE_NAME_TO_IATA.get(stripped.lower(), s[:2])
 
 
 async def _fetch_flight_status(airline: str, flight_number: str) -> dict:
@@ -238,16 +398,17 @@ async def _fetch_flight_status(airline: str, flight_number: str) -> dict:
     num = (flight_number or "").strip().replace(" ", "")
     flight_iata = f"{iata}{num}"
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            r = await client.get(
-                FLIGHT_API_URL,
-                params={
-                    "access_key": config.AVIATIONSTACK_API_KEY,
-                    "flight_iata": flight_iata,
-                    "limit": 1,
-                },
-            )
-            data = r.json()
+        session = await get_session()
+        async with session.get(
+            FLIGHT_API_URL,
+            params={
+                "access_key": config.AVIATIONSTACK_API_KEY,
+                "flight_iata": flight_iata,
+                "limit": 1,
+            },
+            timeout=_EXTERNAL_TIMEOUT,
+        ) as r:
+            data = await r.json(loads=json_codec.loads, content_type=None)
     except Exception as e:
         logger.warning("Flight API request failed: %s", e)
         return {"error": "Could not reach flight status service."}
@@ -284,46 +445,83 @@ ESPN_SPORT_PATHS = {
     "ncaaf": "football/college-football",
     "ncaab": "basketball/mens-college-basketball",
 }
+_ESPN_URLS = MappingProxyType({k: f"{ESPN_SCOREBOARD_BASE}/{v}/scoreboard" for k, v in ESPN_SPORT_PATHS.items()})
+
+
+# Raw events per (sport, date): live/today boards change every ~30s, finished days don't change.
+_ESPN_LIVE_TTL_SEC = 30
+_ESPN_PAST_TTL_SEC = 6 * 3600
+_scoreboard_cache: OrderedDict[tuple[str, str | None], tuple[float, list]] = OrderedDict()
+
+
+async def _get_events_cached(sport_lower: str, url: str, date: str | None) -> list:
+    """ESPN events for sport/date (YYYYMMDD or None = today), TTL-cached. Raises on HTTP errors."""
+    key = (sport_lower, date)
+    events = _cache_get(_scoreboard_cache, key)
+    if events is not None:
+        return events
+    session = await get_session()
+    async with session.get(
+        url,
+        params={"dates": date} if date else None,
+        timeout=_EXTERNAL_TIMEOUT,
+    ) as r:
+        r.raise_for_status()
+        data = await r.json(loads=json_codec.loads)
+    events = data.get("events") or []
+    ttl = _ESPN_PAST_TTL_SEC if date and date < time.strftime("%Y%m%d") else _ESPN_LIVE_TTL_SEC
+    _cache_put(_scoreboard_cache, key, events, ttl)
+    return events
 
 
 async def _fetch_espn_scoreboard(sport: str, team_filter: str | None = None, date_yyyymmdd: str | None = None) -> dict:
-    """Fetch scoreboard from ESPN public API. Returns games list or error. No API key."""
-    sport_lower = (sport or "").strip().lower()
-    path = ESPN_SPORT_PATHS.get(sport_lower)
-    if not path:
+    """Fetch scoreboard from ESPN public API. Returns games list or error. No API key.
+    sport and team_filter are expected stripped and lowercased (the tool handler normalizes them once)."""
+    url = _ESPN_URLS.get(sport)
+    if not url:
         return {"error": f"Unknown sport '{sport}'. Use one of: nfl, nba, mlb, nhl, ncaaf, ncaab."}
-    url = f"{ESPN_SCOREBOARD_BASE}/{path}/scoreboard"
-    params = {}
-    if date_yyyymmdd:
-        params["dates"] = date_yyyymmdd.replace("-", "")[:8]
+    date = date_yyyymmdd.replace("-", "")[:8] if date_yyyymmdd else None
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            r = await client.get(url, params=params or None)
-            r.raise_for_status()
-            data = r.json()
+        events = await _get_events_cached(sport, url, date)
     except Exception as e:
         logger.warning("ESPN scoreboard request failed: %s", e)
         return {"error": "Could not reach sports scores."}
-    events = data.get("events") or []
+    return {"sport": sport, "games": _filter_and_shape(events, team_filter)}
+
+
+# Shared read-only defaults for missing ESPN fields (never mutated).
+_EMPTY: dict = {}
+_EMPTY_LIST = (_EMPTY,)
+
+
+def _filter_and_shape(events: list, team_filter: str | None) -> list[dict]:
+    """Spoken-friendly game dicts from raw ESPN events, optionally filtered by team name/abbreviation (lowercase)."""
     games = []
-    team_key = (team_filter or "").strip().lower()
+    team_key = team_filter or ""
     for ev in events:
-        comps = (ev.get("competitions") or [{}])[0]
-        competitors = comps.get("competitors") or []
-        status = (comps.get("status") or {}).get("type") or {}
+        comps = (ev.get("competitions") or _EMPTY_LIST)[0]
+        competitors = comps.get("competitors") or ()
+        status = (comps.get("status") or _EMPTY).get("type") or _EMPTY
         status_desc = (status.get("shortDetail") or status.get("description") or "—").strip()
-        home = next((c for c in competitors if c.get("homeAway") == "home"), None)
-        away = next((c for c in competitors if c.get("homeAway") == "away"), None)
+        home = away = None
+        for c in competitors:
+            side = c.get("homeAway")
+            if side == "home":
+                home = c
+            elif side == "away":
+                away = c
         if not home or not away:
             continue
-        home_team = (home.get("team") or {}).get("displayName") or (home.get("team") or {}).get("shortDisplayName") or "—"
-        away_team = (away.get("team") or {}).get("displayName") or (away.get("team") or {}).get("shortDisplayName") or "—"
+        home_team_d = home.get("team") or _EMPTY
+        away_team_d = away.get("team") or _EMPTY
+        home_team = home_team_d.get("displayName") or home_team_d.get("shortDisplayName") or "—"
+        away_team = away_team_d.get("displayName") or away_team_d.get("shortDisplayName") or "—"
         home_score = (home.get("score") or "").strip()
         away_score = (away.get("score") or "").strip()
         if team_key:
             if team_key not in home_team.lower() and team_key not in away_team.lower():
-                abbrev = (home.get("team") or {}).get("abbreviation", "").lower()
-                abbrev2 = (away.get("team") or {}).get("abbreviation", "").lower()
+                abbrev = home_team_d.get("abbreviation", "").lower()
+                abbrev2 = away_team_d.get("abbreviation", "").lower()
                 if team_key not in abbrev and team_key not in abbrev2:
                     continue
         score_spoken = f"{away_score} to {home_score}" if (away_score and home_score) else f"{away_score or home_score}"
@@ -335,13 +533,96 @@ async def _fetch_espn_scoreboard(sport: str, team_filter: str | None = None, dat
             "score_spoken": score_spoken,
             "status": status_desc,
         })
-    return {"sport": sport_lower, "games": games}
+    return games
 
 
 _music_process: asyncio.subprocess.Process | None = None
 
+# Player binaries resolved once (shutil.which walks PATH); re-resolved if none was found.
+_MPV_PATH: str | None = shutil.which("mpv")
+_FFPLAY_PATH: str | None = shutil.which("ffplay")
+_AFPLAY_PATH: str | None = shutil.which("afplay")
+
+
+def _refresh_players() -> None:
+    """Re-resolve player paths (e.g. ffmpeg installed while the agent was running)."""
+    global _MPV_PATH, _FFPLAY_PATH, _AFPLAY_PATH
+    _MPV_PATH = shutil.which("mpv")
+    _FFPLAY_PATH = shutil.which("ffplay")
+    _AFPLAY_PATH = shutil.which("afplay")
+
+
+# Persistent mpv: started once in --idle mode and driven over its JSON IPC socket, so changing or
+# stopping music is a socket write instead of a process spawn + decoder init + stream reconnect.
+_mpv_process: asyncio.subprocess.Process | None = None
+_MPV_SOCKET = os.path.join(tempfile.gettempdir(), f"cabin-mpv-{os.getpid()}.sock")
+_MPV_ARGS = ("--idle=yes", "--no-video", "--no-terminal", f"--input-ipc-server={_MPV_SOCKET}")
+_MPV_START_TIMEOUT_SEC = 3.0
+_mpv_lock = asyncio.Lock()
+
+
+async def _ensure_mpv() -> bool:
+    """Start the idle mpv process if it is not running; True once its IPC socket is up."""
+    global _mpv_process
+    if _mpv_process is not None and _mpv_process.returncode is None:
+        return True
+    if _MPV_PATH is None or not hasattr(asyncio, "open_unix_connection"):
+        return False
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(_MPV_SOCKET)
+    _mpv_process = await asyncio.create_subprocess_exec(
+        _MPV_PATH, *_MPV_ARGS,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + _MPV_START_TIMEOUT_SEC
+    while not os.path.exists(_MPV_SOCKET):
+        if _mpv_process.returncode is not None or time.monotonic() > deadline:
+            logger.warning("mpv did not start (exit %s); falling back to ffplay", _mpv_process.returncode)
+            _stop_mpv()
+            return False
+        await asyncio.sleep(0.02)
+    logger.info("Started persistent mpv player (%s)", _MPV_SOCKET)
+    return True
+
 
-def _stop_music_playback() -> None:
+async def _mpv_cmd(*command: str) -> bool:
+    """Send one command to mpv; True if mpv reported success."""
+    async with _mpv_lock:
+        if not await _ensure_mpv():
+            return False
+        try:
+            reader, writer = await asyncio.open_unix_connection(_MPV_SOCKET)
+        except OSError as e:
+            logger.warning("mpv IPC connect failed: %s", e)
+            return False
+        try:
+            writer.write(json_codec.dumps_bytes({"command": list(command), "request_id": 1}) + b"\n")
+            await writer.drain()
+            # mpv may interleave event lines; the reply is the line carrying our request_id
+            async with asyncio.timeout(1.0):
+                while line := await reader.readline():
+                    reply = json_codec.loads(line)
+                    if reply.get("request_id") == 1:
+                        return reply.get("error") == "success"
+            return False
+        except (OSError, TimeoutError, ValueError) as e:
+            logger.warning("mpv IPC %s failed: %s", command[0], e)
+            return False
+        finally:
+            writer.close()
+
+
+def _stop_mpv() -> None:
+    """Terminate the persistent mpv process (shutdown, or a failed start)."""
+    global _mpv_process
+    if _mpv_process is not None and _mpv_process.returncode is None:
+        with contextlib.suppress(ProcessLookupError):
+            _mpv_process.terminate()
+    _mpv_process = None
+
+
+async def _stop_music_playback() -> None:
     global _music_process
     if _music_process is not None:
         try:
@@ -349,61 +630,71 @@ def _stop_music_playback() -> None:
         except Exception:
             pass
         _music_process = None
+    if _mpv_process is not None and _mpv_process.returncode is None:
+        await _mpv_cmd("stop")
 
 
 def _is_remote_url(url: str) -> bool:
     return url.startswith("http://") or url.startswith("https://")
 
 
+# ffplay flags after the binary: no window, exit at end, quiet, reconnect so brief stream drops don't stop playback.
+_FFPLAY_ARGS = (
+    "-nodisp", "-autoexit", "-loglevel", "quiet",
+    "-reconnect", "1", "-reconnect_streamed", "1", "-reconnect_delay_max", "2000",
+)
+
+
+async def _spawn_ffplay(url: str) -> asyncio.subprocess.Process:
+    return await asyncio.create_subprocess_exec(
+        _FFPLAY_PATH, *_FFPLAY_ARGS, "-i", url,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+
+
 async def _start_music_playback(url: str | None = None) -> None:
     """Play the given stream URL in background. Remote URLs need ffplay (afplay does not support HTTP/HTTPS on macOS)."""
     global _music_process
-    _stop_music_playback()
     if not url:
-        url = config.MUSIC_STREAM_URL or getattr(config, "DEFAULT_MUSIC_STREAM_URL", "") or ""
+        url = config.MUSIC_STREAM_URL or config.DEFAULT_MUSIC_STREAM_URL
     if not url:
         logger.warning("No stream URL configured; cabin music will not play. Set MUSIC_STREAM_URL or DEFAULT_MUSIC_STREAM_URL in .env")
         return
+    if _MPV_PATH is None and _FFPLAY_PATH is None and _AFPLAY_PATH is None:
+        _refresh_players()
+    label = url[:60] + "..." if len(url) > 60 else url
+    if _MPV_PATH is not None:
+        if _music_process is not None:
+            await _stop_music_playback()
+        # "replace" swaps the current stream in the running player
+        if await _mpv_cmd("loadfile", url, "replace"):
+            logger.info("Starting cabin music: %s (mpv)", label)
+            return
+    await _stop_music_playback()
     try:
-        if _is_remote_url(url):
-            # afplay does not support HTTP/HTTPS on macOS; use ffplay for streams (reconnect so brief drops don't stop playback)
-            if shutil.which("ffplay"):
-                logger.info("Starting cabin music: %s (ffplay)", url[:60] + "..." if len(url) > 60 else url)
-                _music_process = await asyncio.create_subprocess_exec(
-                    "ffplay", "-nodisp", "-autoexit", "-loglevel", "quiet",
-                    "-reconnect", "1", "-reconnect_streamed", "1", "-reconnect_delay_max", "2000",
-                    "-i", url,
-                    stdout=asyncio.subprocess.DEVNULL,
-                    stderr=asyncio.subprocess.PIPE,
-                )
-                _log_music_stderr(_music_process)
-            else:
-                logger.warning(
-                    "Cabin music requires ffplay for stream URLs. Install ffmpeg: brew install ffmpeg. "
-                    "Then restart the agent and say 'play jazz' again."
-                )
-        else:
+        if _AFPLAY_PATH and not _is_remote_url(url):
             # Local file: use afplay on macOS
-            if shutil.which("afplay"):
-                logger.info("Starting cabin music: %s (afplay)", url[:60] + "..." if len(url) > 60 else url)
-                _music_process = await asyncio.create_subprocess_exec(
-                    "afplay", url,
-                    stdout=asyncio.subprocess.DEVNULL,
-                    stderr=asyncio.subprocess.PIPE,
-                )
-                _log_music_stderr(_music_process)
-            elif shutil.which("ffplay"):
-                logger.info("Starting cabin music: %s (ffplay)", url[:60] + "..." if len(url) > 60 else url)
-                _music_process = await asyncio.create_subprocess_exec(
-                    "ffplay", "-nodisp", "-autoexit", "-loglevel", "quiet",
-                    "-reconnect", "1", "-reconnect_streamed", "1", "-reconnect_delay_max", "2000",
-                    "-i", url,
-                    stdout=asyncio.subprocess.DEVNULL,
-                    stderr=asyncio.subprocess.PIPE,
-                )
-                _log_music_stderr(_music_process)
-            else:
-                logger.warning("No afplay or ffplay found; cabin music will not play.")
+            logger.info("Starting cabin music: %s (afplay)", label)
+            _music_process = await asyncio.create_subprocess_exec(
+                _AFPLAY_PATH, url,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+            )
+        elif _FFPLAY_PATH:
+            # afplay does not support HTTP/HTTPS on macOS; ffplay handles streams and is the local-file fallback
+            logger.info("Starting cabin music: %s (ffplay)", label)
+            _music_process = await _spawn_ffplay(url)
+        elif _is_remote_url(url):
+            logger.warning(
+                "Cabin music requires ffplay for stream URLs. Install ffmpeg: brew install ffmpeg. "
+                "Then restart the agent and say 'play jazz' again."
+            )
+            return
+        else:
+            logger.warning("No afplay or ffplay found; cabin music will not play.")
+            return
+        _log_music_stderr(_music_process)
     except Exception as e:
         logger.warning("Music playback failed: %s", e)
 
@@ -421,93 +712,70 @@ def _log_music_stderr(process: asyncio.subprocess.Process) -> None:
     asyncio.create_task(_read())
 
 
-async def _call_vehicle(path: str, method: str = "GET", body: dict | None = None) -> dict:
-    async with httpx.AsyncClient(timeout=5.0) as client:
-        if method == "GET":
-            r = await client.get(VEHICLE_BASE + path)
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+async def _call_vehicle_raw(path: str, method: str = "GET", body: dict | None = None) -> str:
+    """Vehicle API call returning the JSON body as text, so it can go back to Claude without a parse/re-encode."""
+    client = get_vehicle_client()
+    if method == "GET":
+        r = await client.get(path)
+    else:
+        r = await client.post(path, content=json_codec.dumps_bytes(body or {}), headers=_JSON_HEADERS)
+    r.raise_for_status()
+    if not r.headers.get("content-type", "").startswith("application/json"):
+        raise ValueError(f"Vehicle API {path} returned {r.headers.get('content-type') or 'no content-type'}")
+    return r.text
+
+
+async def _tool_set_lights(args: dict[str, Any], ctx: RideContext) -> str:
+    return await _call_vehicle_raw("/lights", "POST", args)
+
+
+async def _tool_set_climate(args: dict[str, Any], ctx: RideContext) -> str:
+    return await _call_vehicle_raw("/climate", "POST", args)
+
+
+async def _tool_set_audio(args: dict[str, Any], ctx: RideContext) -> str:
+    raw = await _call_vehicle_raw("/audio", "POST", args)
+    action = (args.get("action") or "").strip().lower()
+    if action == "play":
+        play_url = config.MUSIC_STREAM_URL or config.DEFAULT_MUSIC_STREAM_URL
+        if play_url:
+            asyncio.create_task(_start_music_playback(play_url))
         else:
-            r = await client.post(VEHICLE_BASE + path, json=body or {})
-        r.raise_for_status()
-        return r.json()
+            out = json_codec.loads(raw)
+            out["note"] = (
+                "No audio will play from cabin speakers: no stream URL configured. "
+                "Set MUSIC_STREAM_URL or DEFAULT_MUSIC_STREAM_URL in .env, or open the cabin display and connect Spotify."
+            )
+            return json_codec.dumps(out)
+    elif action in ("pause", "stop"):
+        await _stop_music_playback()
+    return raw
 
 
-async def execute_tool(name: str, arguments: dict[str, Any], ctx: RideContext) -> str:
-    """Execute one tool and return a string result for Claude."""
-    try:
-        if name == "set_lights":
-            out = await _call_vehicle("/lights", "POST", arguments)
-            return json.dumps(out)
-        if name == "set_climate":
-            out = await _call_vehicle("/climate", "POST", arguments)
-            return json.dumps(out)
-        if name == "set_audio":
-            out = await _call_vehicle("/audio", "POST", arguments)
-            action = (arguments.get("action") or "").strip().lower()
-            if action == "play":
-                play_url = config.MUSIC_STREAM_URL or getattr(config, "DEFAULT_MUSIC_STREAM_URL", "") or ""
-                if play_url:
-                    asyncio.create_task(_start_music_playback(play_url))
-                else:
-                    out["note"] = (
-                        "No audio will play from cabin speakers: no stream URL configured. "
-                        "Set MUSIC_STREAM_URL or DEFAULT_MUSIC_STREAM_URL in .env, or open the cabin display and connect Spotify."
-                    )
-            elif action in ("pause", "stop"):
-                _stop_music_playback()
-            return json.dumps(out)
-        if name == "get_ride_info":
-            return json.dumps({
-                "route_name": ctx.route_name,
-                "current_stop": ctx.current_stop,
-                "next_stop": ctx.next_stop,
-                "eta_seconds": ctx.eta_seconds,
-                "ride_duration_seconds": ctx.ride_duration_seconds,
-                "elapsed_seconds": ctx.elapsed_seconds,
-                "hour_of_day": ctx.hour_of_day,
-                "passenger_count": ctx.passenger_count,
-                "cabin": ctx.cabin.to_dict(),
-            })
-        if name == "send_display":
-            layout = arguments.get("layout", "idle")
-            data = arguments.get("data") or {}
-            await display_server.send_layout(layout, data)
-            return json.dumps({"ok": True, "layout": layout})
-        if name == "get_weather":
-            location = (arguments.get("location") or config.WEATHER_DEFAULT_LOCATION).strip()
-            result = await _fetch_weather(location)
-            return json.dumps(result)
-        if name == "spotify_play":
-            query = (arguments.get("query") or "").strip()
-            if not query:
-                return json.dumps({"error": "query is required"})
-            kind = (arguments.get("type") or "playlist").strip().lower()
-            if kind not in ("playlist", "track", "album", "artist"):
-                kind = "playlist"
-            device_id = config.SPOTIFY_DEVICE_ID or None
-            result = await spotify_client.search_and_play(query, type=kind, device_id=device_id)
-            return json.dumps(result)
-        if name == "get_flight_status":
-            airline = (arguments.get("airline") or "").strip()
-            flight_number = (arguments.get("flight_number") or "").strip()
-            if not airline or not flight_number:
-                return json.dumps({"error": "airline and flight_number are required"})
-            result = await _fetch_flight_status(airline, flight_number)
-            return json.dumps(result)
-        if name == "get_sports_scores":
-            sport = (arguments.get("sport") or "").strip()
-            team = (arguments.get("team") or "").strip() or None
-            date_arg = (arguments.get("date") or "").strip() or None
-            result = await _fetch_espn_scoreboard(sport, team_filter=team, date_yyyymmdd=date_arg)
-            return json.dumps(result)
-        return json.dumps({"error": f"Unknown tool: {name}"})
-    except Exception as e:
-        logger.exception("Tool %s failed: %s", name, e)
-        return json.dumps({"error": str(e)})
+# Last (state key, context JSON); shared by the system prompt and get_ride_info.
+_last_ctx: tuple[tuple, str] | None = None
+
 
+def _drop_none(d: dict[str, Any]) -> dict[str, Any]:
+    """Copy of d (recursing into dicts) without None values: unknown fields cost prompt tokens and say nothing."""
+    return {k: _drop_none(v) if isinstance(v, dict) else v for k, v in d.items() if v is not None}
 
-def _build_system_prompt(ctx: RideContext, offers_made: list[str]) -> str:
-    import json as _json
-    context_dict = {
+
+def _snapshot_ctx(ctx: RideContext) -> str:
+    """Ride context as compact JSON, rebuilt only when a field changed (compared by value, not identity)."""
+    global _last_ctx
+    cabin = ctx.cabin
+    key = (
+        ctx.route_name, ctx.current_stop, ctx.next_stop, ctx.eta_seconds, ctx.ride_duration_seconds,
+        ctx.elapsed_seconds, ctx.hour_of_day, ctx.passenger_count,
+        cabin.state_key(),
+    )
+    if _last_ctx is not None and _last_ctx[0] == key:
+        return _last_ctx[1]
+    context_json = json_codec.dumps(_drop_none({
         "route_name": ctx.route_name,
         "current_stop": ctx.current_stop,
         "next_stop": ctx.next_stop,
@@ -516,78 +784,269 @@ def _build_system_prompt(ctx: RideContext, offers_made: list[str]) -> str:
         "elapsed_seconds": ctx.elapsed_seconds,
         "hour_of_day": ctx.hour_of_day,
         "passenger_count": ctx.passenger_count,
-        "cabin": ctx.cabin.to_dict(),
-    }
-    context_json = _json.dumps(context_dict, indent=2)
-    return SYSTEM_PROMPT_TEMPLATE.format(
-        context_json=context_json,
-        offers_made=", ".join(offers_made) or "none",
-    )
+        "cabin": cabin.to_dict(),
+    }))
+    _last_ctx = (key, context_json)
+    return context_json
+
+
+async def _tool_get_ride_info(args: dict[str, Any], ctx: RideContext) -> str:
+    return _snapshot_ctx(ctx)
+
+
+async def _tool_send_display(args: dict[str, Any], ctx: RideContext) -> str:
+    layout = args.get("layout", "idle")
+    data = args.get("data") or {}
+    await display_server.send_layout(layout, data)
+    return json_codec.dumps({"ok": True, "layout": layout})
+
+
+async def _tool_get_weather(args: dict[str, Any], ctx: RideContext) -> str:
+    location = (args.get("location") or config.WEATHER_DEFAULT_LOCATION).strip()
+    return json_codec.dumps(await _fetch_weather(location))
+
+
+async def _tool_spotify_play(args: dict[str, Any], ctx: RideContext) -> str:
+    query = (args.get("query") or "").strip()
+    if not query:
+        return json_codec.dumps({"error": "query is required"})
+    kind = (args.get("type") or "playlist").strip().lower()
+    if kind not in ("playlist", "track", "album", "artist"):
+        kind = "playlist"
+    device_id = config.SPOTIFY_DEVICE_ID or None
+    return json_codec.dumps(await spotify_client.search_and_play(query, type=kind, device_id=device_id))
+
+
+async def _tool_get_flight_status(args: dict[str, Any], ctx: RideContext) -> str:
+    airline = (args.get("airline") or "").strip()
+    flight_number = (args.get("flight_number") or "").strip()
+    if not airline or not flight_number:
+        return json_codec.dumps({"error": "airline and flight_number are required"})
+    return json_codec.dumps(await _fetch_flight_status(airline, flight_number))
+
+
+async def _tool_get_sports_scores(args: dict[str, Any], ctx: RideContext) -> str:
+    sport = (args.get("sport") or "").strip().lower()
+    team = (args.get("team") or "").strip().lower() or None
+    date_arg = (args.get("date") or "").strip() or None
+    return json_codec.dumps(await _fetch_espn_scoreboard(sport, team_filter=team, date_yyyymmdd=date_arg))
+
+
+ToolHandler = Callable[[dict[str, Any], RideContext], Awaitable[str]]
+
+# Tool name -> handler; one dict lookup per call instead of an if-chain.
+_HANDLERS: dict[str, ToolHandler] = {
+    "set_lights": _tool_set_lights,
+    "set_climate": _tool_set_climate,
+    "set_audio": _tool_set_audio,
+    "get_ride_info": _tool_get_ride_info,
+    "send_display": _tool_send_display,
+    "get_weather": _tool_get_weather,
+    "spotify_play": _tool_spotify_play,
+    "get_flight_status": _tool_get_flight_status,
+    "get_sports_scores": _tool_get_sports_scores,
+}
+
+
+# Optional: jsonschema validators compiled once per tool, so malformed calls fail locally without a network round-trip.
+try:
+    from jsonschema import Draft202012Validator
+
+    _VALIDATORS = {t["name"]: Draft202012Validator(t["input_schema"]) for t in TOOLS}
+except ImportError:
+    _VALIDATORS = {}
+
+
+async def execute_tool(name: str, arguments: dict[str, Any], ctx: RideContext) -> str:
+    """Execute one tool and return a string result for Claude."""
+    handler = _HANDLERS.get(name)
+    if handler is None:
+        return json_codec.dumps({"error": f"Unknown tool: {name}"})
+    validator = _VALIDATORS.get(name)
+    if validator is not None and not validator.is_valid(arguments):
+        errors = [e.message for e in validator.iter_errors(arguments)]
+        return json_codec.dumps({"error": "invalid arguments", "details": errors[:3]})
+    t0 = time.monotonic()
+    try:
+        return await handler(arguments, ctx)
+    except Exception as e:
+        logger.exception("Tool %s failed: %s", name, e)
+        return json_codec.dumps({"error": str(e)})
+    finally:
+        logger.info("Latency tool=%s ms=%d", name, int((time.monotonic() - t0) * 1000))
+
+
+# Last (key, system blocks) built; consecutive turns with unchanged context and offers reuse the blocks.
+_last_prompt: tuple[tuple, list[dict[str, Any]]] | None = None
+
+
+def build_system_prompt(ctx: RideContext, offers_made: set[str]) -> list[dict[str, Any]]:
+    """System blocks: cached static rules, then the ride context (changes between turns, so never cached)."""
+    global _last_prompt
+    context_json = _snapshot_ctx(ctx)
+    key = (context_json, frozenset(offers_made))
+    if _last_prompt is not None and _last_prompt[0] == key:
+        return _last_prompt[1]
+    dynamic = "".join((_PROMPT_PRE, context_json, _PROMPT_MID, ", ".join(sorted(offers_made)) or "none", _PROMPT_SUF))
+    system = [_SYSTEM_RULES_BLOCK, {"type": "text", "text": dynamic}]
+    _last_prompt = (key, system)
+    return system
+
+
+async def _superseded_display(args: dict[str, Any]) -> str:
+    """Result for a send_display call dropped in favour of a later one in the same batch."""
+    return json_codec.dumps({"ok": True, "layout": args.get("layout", "idle"), "superseded": True})
+
+
+MODEL = "claude-sonnet-4-20250514"
+
+# Model round-trips allowed per run_turn before giving up (guards against tool-call loops).
+MAX_TURNS = 6
+# Earlier exchanges re-sent per turn; each includes its tool_use/tool_result messages. 0 = unlimited.
+MAX_HISTORY_TURNS = config.LLM_MAX_HISTORY_TURNS
+
+
+def _trim_history(conversation: list[dict], max_turns: int) -> list[dict]:
+    """Last max_turns exchanges, cut at a plain-text user message so tool_use/tool_result pairs stay intact."""
+    if max_turns <= 0:
+        return conversation
+    seen = 0
+    for i in range(len(conversation) - 1, -1, -1):
+        msg = conversation[i]
+        if msg["role"] == "user" and isinstance(msg["content"], str):
+            seen += 1
+            if seen == max_turns:
+                return conversation[i:]
+    return conversation
+
+
+# Tools without side effects; identical calls within one turn are answered once.
+_READ_ONLY_TOOLS = frozenset({"get_ride_info", "get_weather", "get_flight_status", "get_sports_scores"})
+
+_anthropic_client: anthropic.AsyncAnthropic | None = None
+
+
+def get_anthropic_client() -> anthropic.AsyncAnthropic:
+    """Shared Anthropic client (created on first turn so a late-loaded API key is picked up).
+    Uses HTTP/2 when h2 is installed so concurrent requests multiplex on one kept-alive connection."""
+    global _anthropic_client
+    if _anthropic_client is None:
+        _anthropic_client = anthropic.AsyncAnthropic(
+            api_key=config.ANTHROPIC_API_KEY,
+            http_client=anthropic.DefaultAsyncHttpxClient(http2=HAS_H2),
+        )
+    return _anthropic_client
 
 
 async def run_turn(
     user_message: str,
     ctx: RideContext,
-    offers_made: list[str],
+    offers_made: set[str],
     conversation: list[dict],
     on_immediate_ack: Callable[[str], Awaitable[None]] | None = None,
+    on_partial: Callable[[str], Awaitable[None]] | None = None,
 ) -> tuple[str, list[dict]]:
     """
     Send user message to Claude with context and tools; execute tool calls and loop until done.
-    If the first response includes text before tool_use, on_immediate_ack(first_sentence) is called
-    so the user hears a quick acknowledgment before tools run.
+    If the first response includes text followed by a tool call, on_immediate_ack(first_sentence) is called as
+    soon as the tool call starts streaming, so the user hears a quick acknowledgment before the model finishes
+    and tools run. Replies that end without tools get no ack.
+    With on_partial, each complete sentence is passed to on_partial as soon as it has streamed in (a message's
+    trailing fragment is flushed when it ends); the caller is then responsible for speaking it and
+    on_immediate_ack is not used.
     Returns (final assistant text for TTS, updated conversation messages).
     """
-    client = anthropic.AsyncAnthropic(api_key=config.ANTHROPIC_API_KEY)
-    system = _build_system_prompt(ctx, offers_made)
-    messages = conversation + [{"role": "user", "content": user_message}]
+    client = get_anthropic_client()
+    system = build_system_prompt(ctx, offers_made)
+    # One copy at entry (the caller's list is left untouched); everything after appends in place.
+    messages = [*_trim_history(conversation, MAX_HISTORY_TURNS), {"role": "user", "content": user_message}]
     final_text = ""
+    acked = ""
     tools_executed = 0
+    iterations = 0
+    # Read-only tool results within this turn, keyed by name + canonical args; repeats reuse the same task.
+    read_only_results: dict[str, asyncio.Task[str]] = {}
+
+    def _run_tool(name: str, args: dict[str, Any]) -> Awaitable[str]:
+        if name not in _READ_ONLY_TOOLS:
+            return execute_tool(name, args, ctx)
+        key = f"{name}:{json_codec.dumps_sorted(args)}"
+        task = read_only_results.get(key)
+        if task is None:
+            task = read_only_results[key] = asyncio.ensure_future(execute_tool(name, args, ctx))
+        else:
+            logger.info("Reusing %s result from earlier in this turn", name)
+        return asyncio.shield(task)
 
     while True:
-        response = await client.messages.create(
-            model="claude-sonnet-4-20250514",
+        iterations += 1
+        if iterations > MAX_TURNS:
+            logger.warning("run_turn hit MAX_TURNS=%d after %d tool(s); giving up", MAX_TURNS, tools_executed)
+            final_text = "Sorry, I got stuck."
+            messages.append({"role": "assistant", "content": final_text})
+            break
+        async with client.messages.stream(
+            model=MODEL,
             max_tokens=1024,
             system=system,
             messages=messages,
             tools=TOOLS,
             tool_choice={"type": "auto"},
-        )
+        ) as stream:
+            if on_partial is not None:
+                await _stream_sentences(stream.text_stream, on_partial)
+            elif on_immediate_ack is not None and tools_executed == 0:
+                acked = await _ack_from_stream(stream, on_immediate_ack)
+            response = await stream.get_final_message()
 
         if response.stop_reason == "end_turn":
             final_text = _text_from_content(response.content)
             if not final_text.strip() and tools_executed > 0:
                 logger.warning("Model ended turn with no text after %d tool(s); not speaking", tools_executed)
-            messages = messages + [
-                {"role": "assistant", "content": response.content},
-            ]
+            messages.append({"role": "assistant", "content": response.content})
             break
 
         if response.stop_reason == "tool_use":
-            if tools_executed == 0 and on_immediate_ack:
-                ack_text = _first_sentence(_text_from_content(response.content))
+            text, tool_blocks = _split_content(response.content)
+            if tools_executed == 0 and on_immediate_ack and on_partial is None and not acked:
+                ack_text = _first_sentence(text)
                 if ack_text:
                     await on_immediate_ack(ack_text)
-            messages = messages + [{"role": "assistant", "content": response.content}]
-            for block in response.content:
-                if (isinstance(block, dict) and block.get("type") == "tool_use") or getattr(block, "type", None) == "tool_use":
-                    tool_id = block.get("id") if isinstance(block, dict) else block.id
-                    name = block.get("name") if isinstance(block, dict) else block.name
-                    inp = block.get("input") if isinstance(block, dict) else block.input
-                    args = inp if isinstance(inp, dict) else json.loads(inp or "{}")
-                    result = await execute_tool(name, args, ctx)
-                    tools_executed += 1
-                    messages.append({
-                        "role": "user",
-                        "content": [{"type": "tool_result", "tool_use_id": tool_id, "content": result}],
-                    })
+            messages.append({"role": "assistant", "content": response.content})
+            calls: list[tuple[str, str, dict[str, Any]]] = []
+            # response comes from the SDK, so blocks are typed objects and tool_use.input is already a dict
+            for block in tool_blocks:
+                args = block.input or {}
+                if not isinstance(args, dict):
+                    logger.warning("Tool %s input was %s, not an object; ignoring it", block.name, type(args).__name__)
+                    args = {}
+                calls.append((block.id, block.name, args))
+            # Only the last send_display in a batch is pushed; earlier cards would be overwritten immediately.
+            display_idx = [i for i, (_, name, _) in enumerate(calls) if name == "send_display"]
+            superseded = set(display_idx[:-1])
+            # Tools in one response hit independent endpoints: run them concurrently, report in call order.
+            results = await asyncio.gather(
+                *(
+                    _superseded_display(args) if i in superseded else _run_tool(name, args)
+                    for i, (_, name, args) in enumerate(calls)
+                ),
+                return_exceptions=True,
+            )
+            tools_executed += len(calls)
+            tool_results = []
+            for (tool_id, name, _), result in zip(calls, results):
+                if isinstance(result, BaseException):
+                    logger.error("Tool %s failed: %s", name, result)
+                    result = json_codec.dumps({"error": str(result)})
+                tool_results.append({"type": "tool_result", "tool_use_id": tool_id, "content": result})
+            messages.append({"role": "user", "content": tool_results})
             continue
 
         # Fallback (unexpected stop_reason)
         final_text = _text_from_content(response.content)
         if not final_text.strip() and tools_executed > 0:
             logger.warning("Model stopped with no text after %d tool(s); not speaking", tools_executed)
-        messages = messages + [{"role": "assistant", "content": response.content}]
+        messages.append({"role": "assistant", "content": response.content})
         break
 
     out = final_text.strip()
@@ -596,37 +1055,96 @@ async def run_turn(
     return (out, messages)
 
 
+def _block_text(block: Any) -> str | None:
+    """Text of a text block (SDK object or dict), else None."""
+    if isinstance(block, dict):
+        return block.get("text") if block.get("type") == "text" else None
+    return getattr(block, "text", None) if getattr(block, "type", None) == "text" else None
+
+
+def _split_content(content: list[Any]) -> tuple[str, list[Any]]:
+    """One pass over SDK response blocks: (concatenated text, tool_use blocks in order)."""
+    texts: list[str] = []
+    tool_blocks: list[Any] = []
+    for block in content:
+        kind = block.type
+        if kind == "text":
+            texts.append(block.text)
+        elif kind == "tool_use":
+            tool_blocks.append(block)
+    return "".join(texts), tool_blocks
+
+
 def _text_from_content(content: list[Any]) -> str:
     """Extract concatenated text from API response content (handles dict and SDK object blocks)."""
-    out = []
-    for block in content or []:
-        if isinstance(block, dict):
-            if block.get("type") == "text":
-                t = block.get("text")
-                if t:
-                    out.append(t)
-        else:
-            if getattr(block, "type", None) == "text":
-                t = getattr(block, "text", None)
-                if t:
-                    out.append(t)
-    return "".join(out)
+    return "".join(t for block in (content or ()) if (t := _block_text(block)))
+
+
+# Sentence boundary candidate in streamed text: whitespace after . ! ? or any newline run
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\n+")
+# Words whose trailing period is not a sentence end (stop and street names, titles, times); single letters too
+_ABBREVIATIONS = frozenset({
+    "st", "ave", "blvd", "rd", "dr", "ln", "hwy", "pkwy", "sq", "mt", "ft",
+    "mr", "mrs", "ms", "jr", "sr", "vs", "approx", "e.g", "i.e", "a.m", "p.m", "u.s",
+})
+
+
+def _split_sentences(buf: str) -> tuple[list[str], str]:
+    """Complete sentences at the front of buf, and the unfinished remainder."""
+    sentences: list[str] = []
+    start = 0
+    for m in _SENTENCE_BREAK.finditer(buf):
+        end = m.start()
+        if buf[end - 1:end] == "." and "\n" not in m.group():
+            words = buf[start:end - 1].split()
+            word = words[-1].lower() if words else ""
+            if word in _ABBREVIATIONS or (len(word) == 1 and word.isalpha()):
+                continue
+        sentences.append(buf[start:end])
+        start = m.end()
+    return sentences, buf[start:]
+
+
+async def _stream_sentences(text_stream: AsyncIterator[str], on_sentence: Callable[[str], Awaitable[None]]) -> None:
+    """Drain text_stream, passing each complete sentence to on_sentence; the trailing fragment is flushed at the end."""
+    buf = ""
+    async for delta in text_stream:
+        buf += delta
+        complete, buf = _split_sentences(buf)
+        for sentence in complete:
+            if sentence := sentence.strip():
+                await on_sentence(sentence)
+    if buf := buf.strip():
+        await on_sentence(buf)
+
+
+async def _ack_from_stream(events: AsyncIterator[Any], on_ack: Callable[[str], Awaitable[None]]) -> str:
+    """Drain a message stream; as soon as the model starts a tool call, call on_ack with the first sentence of the
+    text before it (the tool's input and the rest of the message are still streaming). Returns the acked text."""
+    parts: list[str] = []
+    acked = ""
+    async for event in events:
+        if acked:
+            continue
+        if event.type == "text":
+            parts.append(event.text)
+        elif event.type == "content_block_start" and event.content_block.type == "tool_use":
+            acked = _first_sentence("".join(parts))
+            if acked:
+                await on_ack(acked)
+    return acked
 
 
 def _first_sentence(text: str) -> str:
-    """Return the first sentence (up to first . ! ? or first line) for immediate TTS ack."""
-    if not text or not text.strip():
-        return ""
-    t = text.strip()
-    first_line = t.split("\n")[0].strip()
-    for end in (".", "!", "?"):
-        i = first_line.find(end)
-        if i >= 0:
-            return first_line[: i + 1].strip()
-    return first_line
-
-
-def add_proactive_offer(offers_made: list[str], offer_key: str) -> None:
+    """First sentence of text (same boundaries as streamed speech; all of it if none is complete) for the TTS ack."""
+    complete, rest = _split_sentences(text.strip())
+    for sentence in complete:
+        if sentence := sentence.strip():
+            return sentence
+    return rest.strip()
+
+
+def add_proactive_offer(offers_made: set[str], offer_key: str) -> None:
     """Record that we made this proactive offer so it is not repeated."""
-    if offer_key and offer_key not in offers_made:
-        offers_made.append(offer_key)
+    if offer_key:
+        offers_made.add(offer_key)
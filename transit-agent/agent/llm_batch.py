@@ -0,0 +1,68 @@
+"""Offline Claude requests via the Message Batches API (half price, async). Not for live turns — run_turn stays on streaming."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any
+
+from agent import llm
+from agent.context import RideContext
+
+logger = logging.getLogger(__name__)
+
+# Batches usually finish within minutes; poll gently.
+POLL_INTERVAL_SEC = 30.0
+
+
+def turn_params(
+    user_message: str,
+    ctx: RideContext,
+    offers_made: set[str],
+    conversation: list[dict] | None = None,
+) -> dict[str, Any]:
+    """messages.create kwargs for one turn, mirroring what run_turn sends (use for evals / pre-warming)."""
+    return {
+        "model": llm.MODEL,
+        "max_tokens": 1024,
+        "system": llm.build_system_prompt(ctx, offers_made),
+        "messages": [*(conversation or ()), {"role": "user", "content": user_message}],
+        "tools": list(llm.TOOLS),
+        "tool_choice": {"type": "auto"},
+    }
+
+
+async def submit_batch(requests: list[dict[str, Any]]) -> str:
+    """Submit [{"custom_id": str, "params": {...}}, ...]; returns the batch id."""
+    client = llm.get_anthropic_client()
+    batch = await client.messages.batches.create(requests=requests)
+    logger.info("Submitted message batch %s (%d requests)", batch.id, len(requests))
+    return batch.id
+
+
+async def wait_for_batch(batch_id: str, poll_interval: float = POLL_INTERVAL_SEC) -> None:
+    """Block until the batch has finished processing."""
+    client = llm.get_anthropic_client()
+    while True:
+        batch = await client.messages.batches.retrieve(batch_id)
+        if batch.processing_status == "ended":
+            logger.info("Message batch %s ended: %s", batch_id, batch.request_counts)
+            return
+        await asyncio.sleep(poll_interval)
+
+
+async def batch_results(batch_id: str) -> dict[str, Any]:
+    """custom_id -> Message for succeeded requests, or the error/result object otherwise."""
+    client = llm.get_anthropic_client()
+    out: dict[str, Any] = {}
+    async for entry in await client.messages.batches.results(batch_id):
+        result = entry.result
+        out[entry.custom_id] = result.message if result.type == "succeeded" else result
+    return out
+
+
+async def run_batch(requests: list[dict[str, Any]], poll_interval: float = POLL_INTERVAL_SEC) -> dict[str, Any]:
+    """Submit, wait, and collect results in one call."""
+    batch_id = await submit_batch(requests)
+    await wait_for_batch(batch_id, poll_interval)
+    return await batch_results(batch_id)
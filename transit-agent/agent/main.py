@@ -3,25 +3,35 @@
 import asyncio
 import http.server
 import logging
+import os
+import re
 import socketserver
+import subprocess
 import sys
 import threading
 import time
+from collections import deque
 from pathlib import Path
 
 # Ensure project root is on path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 import anthropic
+import httpx
 import config
 from agent.audio_input import transcript_generator
 from agent.audio_output import play_local_file, speak, speak_nonblocking
+from agent.audio_output import shutdown as shutdown_speech
+from agent.audio_output import aclose_client as aclose_tts_client
 from agent.context import RideContext, make_mock_context
 from agent import display_server
 from agent import echo_guard
-from agent.llm import run_turn, add_proactive_offer
-from agent.proactive import proactive_loop
+from agent import json_codec
+from agent.llm import run_turn, add_proactive_offer, aclose_clients, get_vehicle_client, warm_default_location
+from agent.proactive import TurnState, proactive_loop
+from agent import spotify_client
 from agent import spotify_token_server
+from vehicle_api.state import CabinState
 
 logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s %(message)s")
 logger = logging.getLogger(__name__)
@@ -44,45 +54,74 @@ def get_ride_context() -> RideContext:
     return make_mock_context(
         elapsed_seconds=get_ride_context._elapsed,
         eta_seconds=max(0, 180 - (get_ride_context._elapsed // 10)),
+        cabin=_cabin,
     )
 
 
+# Latest cabin state pushed by the vehicle API (/state/stream); None until the first event arrives.
+_cabin: CabinState | None = None
+
+
+async def _cabin_watcher() -> None:
+    """Keep _cabin current from the vehicle API's server-sent events, reconnecting if the stream drops."""
+    global _cabin
+    client = get_vehicle_client()
+    while True:
+        try:
+            async with client.stream("GET", "/state/stream", timeout=httpx.Timeout(5.0, read=None)) as r:
+                r.raise_for_status()
+                async for line in r.aiter_lines():
+                    if line.startswith("data: "):
+                        _cabin = CabinState.from_dict(json_codec.loads(line[6:]))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Cabin state stream dropped (%s); reconnecting", e)
+        _cabin = None  # fall back to GET /state until the stream is back
+        await asyncio.sleep(1.0)
+
+
 get_ride_context._elapsed = 0
 
 # Shared state for proactive offers and conversation (proactive uses its own conversation list)
-offers_made_shared: list[str] = []
+offers_made_shared: set[str] = set()
 proactive_conversation: list[dict] = []
 
 # Only one LLM turn + TTS at a time (user or proactive) to avoid overlapping responses
 _turn_lock = asyncio.Lock()
 
+# Startup: how long to wait for the vehicle API subprocess to answer /state
+VEHICLE_API_START_TIMEOUT_SEC = 10.0
+
 # Proactive announcements run only after this many seconds of silence (no user or proactive turn)
 PROACTIVE_MIN_SILENCE_SEC = 45
-_last_turn_end_time: float = 0.0
+turn_state = TurnState()
+ride_context_changed = asyncio.Event()  # set when the ride context moves so the proactive loop re-checks at once
 
 # Dedupe transcripts: same/similar phrase within this window is ignored (VAD/Whisper sometimes double-emits)
 _TRANSCRIPT_DEDUPE_SEC = 8
-_last_transcript_key: str = ""
-_last_transcript_time: float = 0
+# Last few (normalized-text hash, processed_at); punctuation/case differences map to the same hash
+_recent_transcripts: deque[tuple[int, float]] = deque(maxlen=8)
+_TRANSCRIPT_NORMALIZE = re.compile(r"[^a-z0-9 ]+")
 
 
-def _transcript_seen_recently(transcript: str) -> bool:
-    """True if we already processed this (normalized) transcript in the last _TRANSCRIPT_DEDUPE_SEC."""
-    import time
-    key = transcript.strip().lower() or ""
-    if not key:
-        return True
-    now = time.monotonic()
-    if key == _last_transcript_key and (now - _last_transcript_time) < _TRANSCRIPT_DEDUPE_SEC:
+def _transcript_key(transcript: str) -> int | None:
+    """Hash of the lowercased transcript without punctuation; None if nothing is left."""
+    norm = _TRANSCRIPT_NORMALIZE.sub("", transcript.lower()).strip()
+    return hash(norm) if norm else None
+
+
+def _transcript_seen_recently(key: int | None) -> bool:
+    """True if this transcript key was processed in the last _TRANSCRIPT_DEDUPE_SEC (or is empty)."""
+    if key is None:
         return True
-    return False
+    cutoff = time.monotonic() - _TRANSCRIPT_DEDUPE_SEC
+    return any(h == key and t > cutoff for h, t in _recent_transcripts)
 
 
-def _mark_transcript_processed(transcript: str) -> None:
-    import time
-    global _last_transcript_key, _last_transcript_time
-    _last_transcript_key = (transcript.strip().lower() or "")
-    _last_transcript_time = time.monotonic()
+def _mark_transcript_processed(key: int | None) -> None:
+    if key is not None:
+        _recent_transcripts.append((key, time.monotonic()))
 
 
 async def _speak_immediate_ack(ack_text: str) -> None:
@@ -94,9 +133,29 @@ async def _speak_immediate_ack(ack_text: str) -> None:
         await speak(ack_text)
 
 
+class _StreamingSpeech:
+    """Queues streamed LLM sentences for TTS as they arrive, so speech starts on the first sentence."""
+
+    def __init__(self) -> None:
+        self._last_done: asyncio.Future[None] | None = None
+
+    async def say(self, sentence: str) -> None:
+        done = await speak_nonblocking(sentence)
+        if done is not None:
+            self._last_done = done
+
+    async def finish(self) -> None:
+        """Wait until everything queued has played."""
+        if self._last_done is not None:
+            await self._last_done
+
+    @property
+    def spoke(self) -> bool:
+        return self._last_done is not None
+
+
 async def on_proactive_trigger(trigger_key: str, user_message: str) -> None:
     """Called when a proactive trigger fires: inject message and get LLM to respond."""
-    global _last_turn_end_time
     async with _turn_lock:
         ctx = get_ride_context()
         add_proactive_offer(offers_made_shared, trigger_key)
@@ -107,24 +166,22 @@ async def on_proactive_trigger(trigger_key: str, user_message: str) -> None:
         if text:
             await speak(text)
         await display_server.send_layout("idle", ctx.cabin.to_dict())
-        _last_turn_end_time = time.monotonic()
+        turn_state.mark_turn_end()
 
 
 async def main() -> None:
-    global _last_turn_end_time
     if not (config.ANTHROPIC_API_KEY and config.ANTHROPIC_API_KEY.strip()):
         sys.exit(
             "ANTHROPIC_API_KEY is not set. Add it to transit-agent/.env or set the environment variable.\n"
             "Get a key at https://console.anthropic.com/"
         )
     # 1. Start mock vehicle API in subprocess
-    import subprocess
     transit_agent_root = Path(__file__).resolve().parent.parent
     proc = subprocess.Popen(
         [sys.executable, "-m", "vehicle_api.server"],
         cwd=str(transit_agent_root),
         env={
-            **__import__("os").environ,
+            **os.environ,
             "VEHICLE_API_PORT": str(config.VEHICLE_API_PORT),
             "PYTHONPATH": str(transit_agent_root),
         },
@@ -133,19 +190,36 @@ async def main() -> None:
     )
     try:
         # Wait for API to be up
-        import httpx
+        vehicle = get_vehicle_client()
         ws_task = None
         proactive_task = None
         spotify_token_task = None
-        for _ in range(50):
+        weather_warm_task = None
+        spotify_warm_task = None
+        cabin_task = None
+        # Exponential backoff from 50 ms (usually up on the first or second try), capped at 0.5 s per wait
+        delay = 0.05
+        deadline = time.monotonic() + VEHICLE_API_START_TIMEOUT_SEC
+        while True:
             try:
-                r = httpx.get(f"http://127.0.0.1:{config.VEHICLE_API_PORT}/state", timeout=1.0)
+                r = await vehicle.get("/state", timeout=0.5)
                 r.raise_for_status()
                 break
             except Exception:
-                await asyncio.sleep(0.2)
-        else:
-            raise RuntimeError("Vehicle API did not start")
+                if time.monotonic() >= deadline:
+                    raise RuntimeError("Vehicle API did not start")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.5)
+
+        # 1a. Follow cabin state changes so turns read it from memory instead of GET /state
+        cabin_task = asyncio.create_task(_cabin_watcher())
+
+        # 1b. Geocode the default weather location in the background so the first weather question is one request
+        weather_warm_task = asyncio.create_task(warm_default_location())
+
+        # 1c. Resolve Spotify hosts and fetch a token in the background so the first play skips DNS and the refresh
+        if config.USE_SPOTIFY:
+            spotify_warm_task = asyncio.create_task(spotify_client.warm())
 
         # 2. Start WebSocket server for display (background task)
         ws_task = asyncio.create_task(display_server.run())
@@ -168,17 +242,17 @@ async def main() -> None:
         spotify_token_task = asyncio.create_task(spotify_token_server.run(config.SPOTIFY_TOKEN_PORT))
 
         # 3. Proactive loop: only runs after PROACTIVE_MIN_SILENCE_SEC of no user/proactive turns
-        offered: set[str] = set()
-
-        def _proactive_can_run() -> bool:
-            return (time.monotonic() - _last_turn_end_time) >= PROACTIVE_MIN_SILENCE_SEC
+        # The fixed intro below is the boarding welcome; mark it offered before the loop can run
+        offered: set[str] = {"boarding"}
 
         proactive_task = asyncio.create_task(
             proactive_loop(
                 lambda: get_ride_context(),
                 on_proactive_trigger,
                 offered,
-                can_run_now=_proactive_can_run,
+                turn_state=turn_state,
+                min_silence_sec=PROACTIVE_MIN_SILENCE_SEC,
+                context_changed=ride_context_changed,
             )
         )
 
@@ -209,8 +283,7 @@ async def main() -> None:
         echo_guard.register_utterance(intro_text)  # so delayed echo of intro is not treated as user input
         async with _turn_lock:
             await speak(intro_text)
-            _last_turn_end_time = time.monotonic()
-        offered.add("boarding")
+            turn_state.mark_turn_end()
         await display_server.send_layout("idle", {
             "route_name": intro_ctx.route_name,
             "next_stop": intro_ctx.next_stop,
@@ -228,37 +301,40 @@ async def main() -> None:
             input_device=config.AUDIO_INPUT_DEVICE,
         ):
             turn_t0 = time.monotonic()
-            if _transcript_seen_recently(transcript):
+            transcript_key = _transcript_key(transcript)
+            if _transcript_seen_recently(transcript_key):
                 logger.debug("Skipping duplicate transcript: %r", transcript[:50])
                 continue
-            _mark_transcript_processed(transcript)
+            _mark_transcript_processed(transcript_key)
             logger.info("User said: %s", transcript)
             get_ride_context._elapsed += 60  # Simulate time passing; replace with real clock
+            ride_context_changed.set()
 
             ctx = get_ride_context()
-            try:
-                r = httpx.get(f"http://127.0.0.1:{config.VEHICLE_API_PORT}/state", timeout=2.0)
-                if r.is_success:
-                    from vehicle_api.state import CabinState
-                    ctx.cabin = CabinState.from_dict(r.json())
-            except Exception:
-                pass
+            if _cabin is None:
+                try:
+                    r = await vehicle.get("/state", timeout=2.0)
+                    if r.is_success:
+                        ctx.cabin = CabinState.from_dict(r.json())
+                except Exception:
+                    pass
 
             async with _turn_lock:
                 try:
                     llm_t0 = time.monotonic()
+                    streaming = _StreamingSpeech()
                     text, conversation = await run_turn(
                         transcript, ctx, offers_made_shared, conversation,
-                        on_immediate_ack=_speak_immediate_ack,
+                        on_partial=streaming.say,
                     )
                     llm_ms = int((time.monotonic() - llm_t0) * 1000)
+                    # Sentences were queued for TTS while the response streamed; wait for the rest to play.
+                    tts_t0 = time.monotonic()
+                    await streaming.finish()
+                    tts_ms = int((time.monotonic() - tts_t0) * 1000)
                     if text:
                         logger.info("Speaking: %s", text[:80] + "..." if len(text) > 80 else text)
-                        tts_t0 = time.monotonic()
-                        await speak(text)
-                        tts_ms = int((time.monotonic() - tts_t0) * 1000)
-                    else:
-                        tts_ms = 0
+                    elif not streaming.spoke:
                         logger.warning("No response text to speak")
                     end_to_end_ms = int((time.monotonic() - turn_t0) * 1000)
                     stt_to_turn_ms = int((turn_t0 - transcript_ts) * 1000)
@@ -290,7 +366,7 @@ async def main() -> None:
                     "eta_seconds": ctx.eta_seconds,
                     "progress_pct": min(90, get_ride_context._elapsed * 100 // max(1, ctx.ride_duration_seconds)),
                 })
-                _last_turn_end_time = time.monotonic()
+                turn_state.mark_turn_end()
 
     finally:
         if proactive_task is not None:
@@ -299,6 +375,18 @@ async def main() -> None:
             spotify_token_task.cancel()
         if ws_task is not None:
             ws_task.cancel()
+        if weather_warm_task is not None:
+            weather_warm_task.cancel()
+        if spotify_warm_task is not None:
+            spotify_warm_task.cancel()
+        if cabin_task is not None:
+            cabin_task.cancel()
+        try:
+            await asyncio.wait_for(shutdown_speech(), timeout=2.0)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            pass
+        await aclose_clients()
+        await aclose_tts_client()
         proc.terminate()
         proc.wait(timeout=5)
 
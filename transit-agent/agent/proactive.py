@@ -1,10 +1,12 @@
 """Proactive trigger system: evaluate ride context periodically and inject offers at most once per ride.
-Announcements run only when can_run_now() is True so they do not overlap or compete with user responses."""
+Announcements run only after a quiet period (TurnState) so they do not overlap or compete with user responses."""
 
 from __future__ import annotations
 
 import asyncio
 import logging
+import math
+import time
 from typing import Callable, Awaitable
 
 from agent.context import RideContext
@@ -12,23 +14,98 @@ from agent.context import RideContext
 logger = logging.getLogger(__name__)
 
 INTERVAL_SEC = 60
+MIN_WAKE_SEC = 1.0  # floor on the deadline-driven sleep so a trigger held back by a turn cannot spin the loop
+_CLOCK_RESOLUTION = time.get_clock_info("monotonic").resolution
 
-TRIGGERS = [
-    ("boarding", lambda ctx: ctx.elapsed_seconds < 15, "Welcome + one capability offer"),
-    ("long_ride", lambda ctx: ctx.ride_duration_seconds > 600 and 180 < ctx.elapsed_seconds < 300, "Offer ambient lighting or music"),
-    ("pre_arrival", lambda ctx: ctx.eta_seconds < 180, "Heads up, stop name"),
-    ("nighttime", lambda ctx: (ctx.hour_of_day > 21 or ctx.hour_of_day < 5) and ctx.elapsed_seconds > 120, "Offer to adjust cabin lighting"),
-    ("mid_ride_silence", lambda ctx: ctx.elapsed_seconds > 600, "Single gentle offer (no recent interaction)"),
-]
 
-# Default messages for each trigger (agent will respond in its tone)
-TRIGGER_MESSAGES = {
-    "boarding": "[PROACTIVE] A passenger just boarded. Give a brief welcome and one short capability offer (e.g. lights, climate, or music).",
-    "long_ride": "[PROACTIVE] This is a long ride. Offer ambient lighting or music once, in one short sentence. Do not list other capabilities.",
-    "pre_arrival": "[PROACTIVE] We're arriving soon. Give a heads up with the next stop name and approximate time only.",
-    "nighttime": "[PROACTIVE] It's nighttime. Offer once to adjust cabin lighting if they'd like. One sentence.",
-    "mid_ride_silence": "[PROACTIVE] Mid-ride with no recent interaction. One gentle, brief offer only. Do not list capabilities or repeat previous offers.",
-}
+class TurnState:
+    """When the last user/proactive turn ended; lets the proactive loop wait for silence instead of polling."""
+
+    def __init__(self) -> None:
+        self.last_turn_end = 0.0
+        self._turn_ended = asyncio.Event()
+
+    def mark_turn_end(self) -> None:
+        self.last_turn_end = time.monotonic()
+        self._turn_ended.set()
+
+    def is_silent(self, duration: float) -> bool:
+        return time.monotonic() - self.last_turn_end >= duration
+
+    async def await_silence(self, duration: float) -> None:
+        """Return once no turn has ended for `duration` seconds; a turn ending meanwhile restarts the wait."""
+        while (remaining := self.last_turn_end + duration - time.monotonic()) > 0:
+            self._turn_ended.clear()
+            try:
+                await asyncio.wait_for(self._turn_ended.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+# Trigger table (key, condition, deadline, message); the message is what the agent is told when the trigger fires
+# and it responds in its own tone. Conditions and deadlines are Python expressions over the ride context, read once
+# per evaluation as es = elapsed_seconds, rd = ride_duration_seconds, eta = eta_seconds, hod = hour_of_day.
+# The deadline is the seconds until the condition can start holding, assuming elapsed time runs and the ETA counts
+# down in real time (<= 0 if it may hold now, inf if it cannot; hour-of-day changes are left to the interval cap).
+TRIGGERS = (
+    (
+        "boarding",
+        "es < 15",
+        "0 if es < 15 else inf",
+        "[PROACTIVE] A passenger just boarded. Give a brief welcome and one short capability offer (e.g. lights, climate, or music).",
+    ),
+    (
+        "long_ride",
+        "rd > 600 and 180 < es < 300",
+        "181 - es if rd > 600 and es < 300 else inf",
+        "[PROACTIVE] This is a long ride. Offer ambient lighting or music once, in one short sentence. Do not list other capabilities.",
+    ),
+    (
+        "pre_arrival",
+        "eta < 180",
+        "eta - 179",
+        "[PROACTIVE] We're arriving soon. Give a heads up with the next stop name and approximate time only.",
+    ),
+    (
+        "nighttime",
+        "(hod > 21 or hod < 5) and es > 120",
+        "121 - es if hod > 21 or hod < 5 else inf",
+        "[PROACTIVE] It's nighttime. Offer once to adjust cabin lighting if they'd like. One sentence.",
+    ),
+    (
+        "mid_ride_silence",
+        "es > 600",
+        "601 - es",
+        "[PROACTIVE] Mid-ride with no recent interaction. One gentle, brief offer only. Do not list capabilities or repeat previous offers.",
+    ),
+)
+
+_READ_CONTEXT = "    es = ctx.elapsed_seconds; rd = ctx.ride_duration_seconds; eta = ctx.eta_seconds; hod = ctx.hour_of_day"
+
+
+def _compile_triggers(
+    triggers: tuple[tuple[str, str, str, str], ...],
+) -> tuple[Callable[[RideContext, set[str]], list[tuple[str, str]]], Callable[[RideContext, set[str]], float]]:
+    """Generate the evaluator and the next-deadline function from the table; each reads the context once and
+    tests every not-yet-offered trigger inline, in table order."""
+    fire = ["def _fire_triggers(ctx, offered):", _READ_CONTEXT, "    fired = []"]
+    deadline = ["def _next_deadline(ctx, offered):", _READ_CONTEXT, "    d = inf"]
+    namespace: dict[str, object] = {"inf": math.inf}
+    for i, (key, cond, until, message) in enumerate(triggers):
+        namespace[f"_T{i}"] = (key, message)
+        fire.append(f"    if {key!r} not in offered and ({cond}):")
+        fire.append(f"        fired.append(_T{i})")
+        deadline.append(f"    if {key!r} not in offered:")
+        deadline.append(f"        d = min(d, {until})")
+    fire.append("    return fired")
+    deadline.append("    return max(d, 0)")
+    exec(compile("\n".join(fire + [""] + deadline), "<proactive triggers>", "exec"), namespace)
+    return namespace["_fire_triggers"], namespace["_next_deadline"]
+
+
+# _fire_triggers: (key, message) for every not-yet-offered trigger whose condition holds, in TRIGGERS order.
+# _next_deadline: seconds until the next not-yet-offered trigger can start holding; 0 if one may hold now.
+_fire_triggers, _next_deadline = _compile_triggers(TRIGGERS)
+_TRIGGER_KEYS = frozenset(key for key, *_ in TRIGGERS)
 
 
 async def proactive_loop(
@@ -36,27 +113,45 @@ async def proactive_loop(
     on_trigger: Callable[[str, str], Awaitable[None]],
     offered: set[str],
     interval_sec: float = INTERVAL_SEC,
-    can_run_now: Callable[[], bool] | None = None,
+    turn_state: TurnState | None = None,
+    min_silence_sec: float = 0.0,
+    context_changed: asyncio.Event | None = None,
 ) -> None:
     """
-    Every interval_sec, evaluate triggers. If one fires and hasn't been offered this session,
-    and can_run_now() is True (or omitted), call on_trigger(trigger_key, user_message) and add key to offered.
-    If can_run_now() is False, the trigger is not run and not marked offered, so it may fire again next interval.
+    Every interval_sec, evaluate triggers. If one fires and hasn't been offered this session, call
+    on_trigger(trigger_key, user_message) and add key to offered. With turn_state, each tick first waits until
+    min_silence_sec have passed since the last turn ended (so evaluation resumes as soon as it is quiet, not on
+    the next tick); a trigger that loses the race to a new turn is not marked offered and may fire later.
+    With context_changed (set by whoever updates the ride context), a tick also happens as soon as the event is
+    set, and while the context's clock is advancing the loop sleeps only until the next trigger boundary.
+    Returns once every trigger has been offered.
     """
+    prev_elapsed: int | None = None
     while True:
-        await asyncio.sleep(interval_sec)
-        if can_run_now is not None and not can_run_now():
-            continue
-        ctx = get_context()
-        for key, condition, _ in TRIGGERS:
-            if key in offered:
-                continue
-            if not condition(ctx):
+        if offered >= _TRIGGER_KEYS:
+            logger.info("All proactive triggers offered; stopping proactive loop")
+            return
+        if context_changed is None:
+            await asyncio.sleep(interval_sec)
+        else:
+            ctx = get_context()
+            delay = interval_sec
+            if ctx.elapsed_seconds != prev_elapsed:  # a context that is not advancing would just re-wake early
+                delay = min(interval_sec, max(MIN_WAKE_SEC, _next_deadline(ctx, offered) + _CLOCK_RESOLUTION))
+            prev_elapsed = ctx.elapsed_seconds
+            try:
+                await asyncio.wait_for(context_changed.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            context_changed.clear()
+        if turn_state is not None:
+            await turn_state.await_silence(min_silence_sec)
+        for key, message in _fire_triggers(get_context(), offered):
+            if key in offered:  # a trigger that ran earlier this tick may have offered it
                 continue
-            if can_run_now is not None and not can_run_now():
+            if turn_state is not None and not turn_state.is_silent(min_silence_sec):
                 continue
             offered.add(key)
-            message = TRIGGER_MESSAGES.get(key, f"[PROACTIVE] Trigger: {key}")
             try:
                 await on_trigger(key, message)
             except Exception as e:
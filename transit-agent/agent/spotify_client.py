@@ -1,6 +1,6 @@
 """Spotify Web API: token refresh, search, start playback. Requires Premium for playback.
-Optional: set SPOTIFY_OUTPUT_DEVICE_NAME and install switchaudio-osx (brew install switchaudio-osx)
-to route Spotify (cabin tab) audio to the same speakers as the agent. See SPOTIFY_INTEGRATION.md."""
+Optional: set SPOTIFY_OUTPUT_DEVICE_NAME to route Spotify (cabin tab) audio to the same speakers as the agent
+(CoreAudio on macOS; falls back to switchaudio-osx, brew install switchaudio-osx). See SPOTIFY_INTEGRATION.md."""
 
 from __future__ import annotations
 
@@ -8,11 +8,20 @@ import asyncio
 import base64
 import logging
 import subprocess
+import time
 from typing import Any
 
 import httpx
 
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HAS_H2 = True
+except ImportError:
+    HAS_H2 = False
+
 import config
+from agent import coreaudio
+from agent import json_codec
 
 logger = logging.getLogger(__name__)
 
@@ -20,33 +29,117 @@ TOKEN_URL = "https://accounts.spotify.com/api/token"
 API_BASE = "https://api.spotify.com/v1"
 CABIN_DEVICE_NAME = "Clyde Cabin"
 
+# Client credentials are fixed for the process, so the token request headers are built once.
+_TOKEN_HEADERS = {
+    "Authorization": "Basic " + base64.b64encode(f"{config.SPOTIFY_CLIENT_ID}:{config.SPOTIFY_CLIENT_SECRET}".encode()).decode(),
+    "Content-Type": "application/x-www-form-urlencoded",
+}
+
+CABIN_DEVICE_TTL_SEC = 300.0  # the cabin tab's device id is stable for a session; 404 on play drops it early
+TOKEN_EXPIRY_MARGIN_SEC = 60.0  # refresh this long before Spotify says the token expires
+
+_access_token: str | None = None
+_token_expires_at = 0.0  # time.monotonic() deadline for _access_token
+_output_set_to: str | None = None  # system output already routed this session (skip re-setting it every play)
+_cabin_device_id: str | None = None
+_cabin_device_expires_at = 0.0
+# Singleflight: concurrent callers with a stale token share one refresh request.
+_refresh_inflight: asyncio.Task[str | None] | None = None
+
+# One pooled client for accounts.spotify.com and api.spotify.com, tied to the loop that created it.
+_client: httpx.AsyncClient | None = None
+_client_loop_id: int | None = None
+
 
-def _basic_auth() -> str:
-    raw = f"{config.SPOTIFY_CLIENT_ID}:{config.SPOTIFY_CLIENT_SECRET}"
-    return base64.b64encode(raw.encode()).decode()
+def _get_client() -> httpx.AsyncClient:
+    """Shared keep-alive client; recreated if called from a different event loop than the one it was built on."""
+    global _client, _client_loop_id
+    loop_id = id(asyncio.get_running_loop())
+    if _client is None or _client_loop_id != loop_id:
+        _client = httpx.AsyncClient(
+            base_url=API_BASE,
+            timeout=httpx.Timeout(10.0, connect=3.0),
+            # Spotify actions are often minutes apart; keep the warm connection longer than httpx's 5 s default
+            limits=httpx.Limits(max_keepalive_connections=5, max_connections=20, keepalive_expiry=30.0),
+            http2=HAS_H2,
+        )
+        _client_loop_id = loop_id
+    return _client
+
+
+async def aclose() -> None:
+    """Close the shared client (call on shutdown)."""
+    global _client, _client_loop_id
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _client_loop_id = None
 
 
 async def get_access_token() -> str | None:
-    """Get a valid access token using refresh token (no cache; tokens expire in 1h)."""
+    """Get a valid access token, reusing the cached one until shortly before it expires (tokens last 1h)."""
+    global _refresh_inflight
     if not config.SPOTIFY_REFRESH_TOKEN or not config.SPOTIFY_CLIENT_ID or not config.SPOTIFY_CLIENT_SECRET:
         return None
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        r = await client.post(
-            TOKEN_URL,
-            data={
-                "grant_type": "refresh_token",
-                "refresh_token": config.SPOTIFY_REFRESH_TOKEN,
-            },
-            headers={
-                "Authorization": f"Basic {_basic_auth()}",
-                "Content-Type": "application/x-www-form-urlencoded",
-            },
+    if _access_token and time.monotonic() < _token_expires_at - TOKEN_EXPIRY_MARGIN_SEC:
+        return _access_token
+    task = _refresh_inflight
+    if task is None:
+        task = _refresh_inflight = asyncio.create_task(_refresh_access_token())
+        task.add_done_callback(_clear_refresh_inflight)
+    # shield: one caller being cancelled must not cancel the refresh the others are waiting on
+    return await asyncio.shield(task)
+
+
+def _clear_refresh_inflight(task: asyncio.Task) -> None:
+    global _refresh_inflight
+    if _refresh_inflight is task:
+        _refresh_inflight = None
+
+
+async def warm() -> None:
+    """Resolve the Spotify hosts and fetch a token ahead of the first play (call once at startup when configured)."""
+    loop = asyncio.get_running_loop()
+    try:
+        await asyncio.gather(
+            loop.getaddrinfo("api.spotify.com", 443),
+            loop.getaddrinfo("accounts.spotify.com", 443),
         )
+        # Also leaves a warm connection to accounts.spotify.com in the pool
+        await get_access_token()
+    except Exception as e:
+        logger.warning("Spotify warm-up failed: %s", e)
+        return
+    logger.info("Spotify warm-up done")
+
+
+def token_ttl() -> int:
+    """Whole seconds the cached access token stays usable (before the refresh margin); 0 if none is cached."""
+    if not _access_token:
+        return 0
+    return max(0, int(_token_expires_at - TOKEN_EXPIRY_MARGIN_SEC - time.monotonic()))
+
+
+async def _refresh_access_token() -> str | None:
+    """Exchange the refresh token for a new access token and cache it."""
+    global _access_token, _token_expires_at
+    r = await _get_client().post(
+        TOKEN_URL,
+        data={
+            "grant_type": "refresh_token",
+            "refresh_token": config.SPOTIFY_REFRESH_TOKEN,
+        },
+        headers=_TOKEN_HEADERS,
+    )
     if r.status_code != 200:
         logger.warning("Spotify token refresh failed: %s %s", r.status_code, r.text[:200])
         return None
-    data = r.json()
-    return data.get("access_token")
+    data = json_codec.loads(r.content)
+    token = data.get("access_token")
+    if token:
+        _access_token = token
+        _token_expires_at = time.monotonic() + float(data.get("expires_in") or 3600)
+    return token
 
 
 async def search(query: str, type: str = "playlist", limit: int = 5) -> dict[str, Any]:
@@ -54,15 +147,14 @@ async def search(query: str, type: str = "playlist", limit: int = 5) -> dict[str
     token = await get_access_token()
     if not token:
         return {"error": "Spotify not configured or token refresh failed"}
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        r = await client.get(
-            f"{API_BASE}/search",
-            params={"q": query, "type": type, "limit": limit},
-            headers={"Authorization": f"Bearer {token}"},
-        )
+    r = await _get_client().get(
+        "/search",
+        params={"q": query, "type": type, "limit": limit},
+        headers={"Authorization": f"Bearer {token}"},
+    )
     if r.status_code != 200:
         return {"error": f"Search failed: {r.status_code}"}
-    return r.json()
+    return json_codec.loads(r.content)
 
 
 def _first_uri(data: dict, kind: str) -> str | None:
@@ -94,23 +186,29 @@ async def get_devices() -> list[dict[str, Any]]:
     token = await get_access_token()
     if not token:
         return []
-    async with httpx.AsyncClient(timeout=5.0) as client:
-        r = await client.get(
-            f"{API_BASE}/me/player/devices",
-            headers={"Authorization": f"Bearer {token}"},
-        )
+    r = await _get_client().get(
+        "/me/player/devices",
+        headers={"Authorization": f"Bearer {token}"},
+        timeout=5.0,
+    )
     if r.status_code != 200:
         return []
-    data = r.json()
+    data = json_codec.loads(r.content)
     return data.get("devices") or []
 
 
 async def resolve_cabin_device_id() -> str | None:
-    """Return device_id for 'Clyde Cabin' if it appears in the user's devices; otherwise None."""
+    """Return device_id for 'Clyde Cabin' if it appears in the user's devices; otherwise None. Cached for
+    CABIN_DEVICE_TTL_SEC once found."""
+    global _cabin_device_id, _cabin_device_expires_at
+    if _cabin_device_id and time.monotonic() < _cabin_device_expires_at:
+        return _cabin_device_id
     devices = await get_devices()
     for d in devices:
         if d and d.get("name") == CABIN_DEVICE_NAME:
-            return d.get("id")
+            _cabin_device_id = d.get("id")
+            _cabin_device_expires_at = time.monotonic() + CABIN_DEVICE_TTL_SEC
+            return _cabin_device_id
     return None
 
 
@@ -129,29 +227,51 @@ async def play(uri: str, device_id: str | None = None) -> dict[str, Any]:
     # Debug: log what we're sending (device_id truncated for logs)
     device_log = (device_id[:12] + "..." if device_id and len(device_id) > 12 else device_id) or "default"
     logger.info("Spotify play: uri=%s device_id=%s", uri, device_log)
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        r = await client.put(
-            f"{API_BASE}/me/player/play",
-            params=params or None,
-            json=body,
-            headers={"Authorization": f"Bearer {token}"},
-        )
+    r = await _get_client().put(
+        "/me/player/play",
+        params=params or None,
+        content=json_codec.dumps_bytes(body),
+        headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
+    )
     if r.status_code == 204:
         logger.info("Spotify play: 204 OK (playback started on device; if it stops, check browser console on cabin tab for [Spotify SDK] playback_error / state)")
         return {"ok": True, "uri": uri}
     if r.status_code == 404:
+        _forget_cabin_device()
         logger.warning("Spotify play: 404 (no active device). Response: %s", r.text[:150])
         return {"error": "No active Spotify device. Open the cabin display and ensure Spotify is connected."}
     logger.warning("Spotify play: %s %s", r.status_code, r.text[:200])
     return {"error": f"Playback failed: {r.status_code} {r.text[:200]}"}
 
 
+def _forget_cabin_device() -> None:
+    """Drop the cached cabin device id so the next play looks it up again."""
+    global _cabin_device_id, _cabin_device_expires_at
+    _cabin_device_id = None
+    _cabin_device_expires_at = 0.0
+
+
 def _set_system_output_if_configured() -> None:
-    """Route macOS system audio to SPOTIFY_OUTPUT_DEVICE_NAME so cabin tab uses cabin speakers. Requires switchaudio-osx."""
+    """Route macOS system audio to SPOTIFY_OUTPUT_DEVICE_NAME so cabin tab uses cabin speakers. Uses CoreAudio
+    directly when available, else switchaudio-osx. Done once per session."""
+    global _output_set_to
     name = getattr(config, "SPOTIFY_OUTPUT_DEVICE_NAME", "") or ""
-    if not name:
+    if not name or name == _output_set_to:
         return
     logger.info("Spotify: setting system output to %r (from SPOTIFY_OUTPUT_DEVICE_NAME)", name)
+    if coreaudio.AVAILABLE:
+        try:
+            if coreaudio.set_default_output(name):
+                _output_set_to = name
+                logger.info("Spotify: system output set to %s", name)
+            else:
+                logger.warning(
+                    "Spotify: no output device named %r. Available (use exact name in SPOTIFY_OUTPUT_DEVICE_NAME): %s",
+                    name, ", ".join(coreaudio.output_device_names()),
+                )
+            return
+        except OSError as e:
+            logger.warning("Spotify: CoreAudio could not set system output (%s); trying SwitchAudioSource", e)
     try:
         r = subprocess.run(
             ["SwitchAudioSource", "-s", name],
@@ -160,6 +280,7 @@ def _set_system_output_if_configured() -> None:
             text=True,
         )
         if r.returncode == 0:
+            _output_set_to = name
             logger.info("Spotify: system output set to %s", name)
         else:
             err = (r.stderr or r.stdout or "").strip() or "(no message)"
@@ -174,6 +295,11 @@ def _set_system_output_if_configured() -> None:
         logger.warning("Spotify: set system output failed: %s", e)
 
 
+def _log_route_failure(fut: asyncio.Future) -> None:
+    if not fut.cancelled() and fut.exception() is not None:
+        logger.warning("Spotify: set system output failed: %s", fut.exception())
+
+
 def _log_available_audio_sources() -> None:
     """Log available output device names so user can fix SPOTIFY_OUTPUT_DEVICE_NAME."""
     try:
@@ -193,9 +319,17 @@ def _log_available_audio_sources() -> None:
 
 async def search_and_play(query: str, type: str = "playlist", device_id: str | None = None) -> dict[str, Any]:
     """Search for query, take first result, start playback. Returns result for the agent to report."""
-    # Route system audio to cabin speakers before playing (macOS: SwitchAudioSource)
-    await asyncio.get_running_loop().run_in_executor(None, _set_system_output_if_configured)
-    data = await search(query, type=type, limit=5)
+    # Route system audio to cabin speakers (macOS) alongside the search; it only has to land before playback is audible
+    route = asyncio.get_running_loop().run_in_executor(None, _set_system_output_if_configured)
+    route.add_done_callback(_log_route_failure)
+    # Target cabin device so playback goes to the display tab, not another device
+    if not device_id and config.SPOTIFY_DEVICE_ID:
+        device_id = config.SPOTIFY_DEVICE_ID
+    if device_id:
+        data = await search(query, type=type, limit=5)
+    else:
+        # Look the cabin device up while the search is in flight (same token, same pooled connection)
+        data, device_id = await asyncio.gather(search(query, type=type, limit=5), resolve_cabin_device_id())
     if data.get("error"):
         return data
     uri = _first_uri(data, type)
@@ -212,11 +346,6 @@ async def search_and_play(query: str, type: str = "playlist", device_id: str | N
     elif not uri:
         _log_search_debug(data, type, query)
         return {"error": f"No {type} found for '{query}'"}
-    # Target cabin device so playback goes to the display tab, not another device
-    if not device_id and config.SPOTIFY_DEVICE_ID:
-        device_id = config.SPOTIFY_DEVICE_ID
-    if not device_id:
-        device_id = await resolve_cabin_device_id()
     if device_id:
         logger.info("Spotify: playing to device_id=%s (cabin tab)", device_id[:20] + "..." if len(device_id) > 20 else device_id)
     else:
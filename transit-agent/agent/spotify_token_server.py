@@ -1,10 +1,12 @@
 """Small HTTP server that serves the current Spotify access token for the display Web Playback SDK."""
 
 import asyncio
+import hashlib
 import logging
 
 from aiohttp import web
 
+from agent import json_codec
 from agent import spotify_client
 import config
 
@@ -14,15 +16,25 @@ logger = logging.getLogger(__name__)
 async def handle_spotify_token(request: web.Request) -> web.Response:
     """GET /spotify_token -> JSON { access_token } for the display to init Web Playback SDK."""
     if not config.USE_SPOTIFY:
-        resp = web.json_response({"error": "Spotify not configured"}, status=503)
+        resp = web.json_response({"error": "Spotify not configured"}, status=503, dumps=json_codec.dumps)
     else:
         token = await spotify_client.get_access_token()
         if not token:
-            resp = web.json_response({"error": "Token refresh failed"}, status=503)
+            resp = web.json_response({"error": "Token refresh failed"}, status=503, dumps=json_codec.dumps)
         else:
-            resp = web.json_response({"access_token": token})
+            # The token only changes on refresh, so re-polls with the current ETag get an empty 304
+            etag = f'"{hashlib.blake2b(token.encode(), digest_size=8).hexdigest()}"'
+            if request.headers.get("If-None-Match") == etag:
+                resp = web.Response(status=304)
+            else:
+                resp = web.json_response({"access_token": token}, dumps=json_codec.dumps)
+            resp.headers["ETag"] = etag
+            # Let the browser reuse the token until it is due for refresh instead of asking again
+            resp.headers["Cache-Control"] = f"private, max-age={spotify_client.token_ttl()}"
     # Allow browser pages (e.g. http://127.0.0.1:8760/spotify_connect.html) to fetch this
     resp.headers["Access-Control-Allow-Origin"] = "*"
+    resp.headers["Vary"] = "Origin"
+    resp.headers.setdefault("Cache-Control", "no-store")  # errors must not be cached
     return resp
 
 
@@ -3,16 +3,16 @@
 from __future__ import annotations
 
 import os
+import re
 from pathlib import Path
 
-# Load .env if present (no extra dependency required for minimal setup)
+# Load .env if present (no extra dependency required for minimal setup). One regex pass: KEY=value per line,
+# value optionally wrapped in matching quotes; comments and malformed lines simply don't match.
+_ENV_LINE = re.compile(r"""^[ \t]*([A-Za-z_][A-Za-z0-9_]*)[ \t]*=[ \t]*(?:"([^"\n]*)"|'([^'\n]*)'|(.*?))[ \t\r]*$""", re.M)
 _env = Path(__file__).resolve().parent / ".env"
 if _env.exists():
-    for line in _env.read_text().strip().splitlines():
-        line = line.strip()
-        if line and not line.startswith("#") and "=" in line:
-            k, v = line.split("=", 1)
-            os.environ.setdefault(k.strip(), v.strip().strip('"').strip("'"))
+    for _k, _dq, _sq, _bare in _ENV_LINE.findall(_env.read_text()):
+        os.environ.setdefault(_k, _dq or _sq or _bare)
 
 # API keys
 ANTHROPIC_API_KEY: str = os.environ.get("ANTHROPIC_API_KEY", "")
@@ -21,11 +21,19 @@ ELEVENLABS_VOICE_ID: str = os.environ.get("ELEVENLABS_VOICE_ID", "")
 
 # STT
 WHISPER_MODEL: str = os.environ.get("WHISPER_MODEL", "base.en")
+# Force a CTranslate2 compute_type (int8, int8_float16, float16, float32); empty = fastest supported
+WHISPER_COMPUTE_TYPE: str = os.environ.get("TRANSIT_WHISPER_COMPUTE", "").strip()
 STT_SILENCE_MS: int = int(os.environ.get("STT_SILENCE_MS", "500"))
 STT_MIN_UTTERANCE_MS: int = int(os.environ.get("STT_MIN_UTTERANCE_MS", "400"))
 STT_MAX_UTTERANCE_MS: int = int(os.environ.get("STT_MAX_UTTERANCE_MS", "8000"))
 STT_MIN_SPEECH_START_MS: int = int(os.environ.get("STT_MIN_SPEECH_START_MS", "120"))
 STT_ENERGY_THRESHOLD: float = float(os.environ.get("STT_ENERGY_THRESHOLD", "0.02"))
+# Energy VAD: minimum zero crossings per sample to count as speech (0 = energy only)
+STT_ZCR_MIN: float = float(os.environ.get("STT_ZCR_MIN", "0.0"))
+# Linux: SCHED_FIFO priority for the mic callback thread (0 = leave default scheduling)
+STT_AUDIO_RT_PRIORITY: int = int(os.environ.get("STT_AUDIO_RT_PRIORITY", "10"))
+# Silero VAD ONNX export (https://github.com/snakers4/silero-vad); used with onnxruntime when present
+SILERO_VAD_ONNX: str = os.environ.get("SILERO_VAD_ONNX", str(Path(__file__).resolve().parent / "assets" / "silero_vad.onnx"))
 
 # Ports
 VEHICLE_API_PORT: int = int(os.environ.get("VEHICLE_API_PORT", "8001"))
@@ -33,6 +41,9 @@ WS_PORT: int = int(os.environ.get("WS_PORT", "8765"))
 WS_HOST: str = os.environ.get("WS_HOST", "0.0.0.0")  # 0.0.0.0 for remote cabin clients
 DISPLAY_HTTP_PORT: int = int(os.environ.get("DISPLAY_HTTP_PORT", "3000"))
 
+# LLM: earlier user exchanges (with their tool calls) re-sent each turn; older ones are dropped. 0 = keep all
+LLM_MAX_HISTORY_TURNS: int = int(os.environ.get("LLM_MAX_HISTORY_TURNS", "8"))
+
 # TTS: use ElevenLabs if key set, else pyttsx3
 USE_ELEVENLABS: bool = bool(ELEVENLABS_API_KEY and ELEVENLABS_VOICE_ID)
 IMMEDIATE_ACK_ASYNC: bool = os.environ.get("IMMEDIATE_ACK_ASYNC", "1").strip().lower() not in ("0", "false", "no", "off")
@@ -60,7 +71,7 @@ SPOTIFY_REFRESH_TOKEN: str = os.environ.get("SPOTIFY_REFRESH_TOKEN", "").strip()
 # Redirect URI for OAuth (must match Spotify Dashboard exactly). Default 127.0.0.1; use localhost if you added that.
 SPOTIFY_REDIRECT_URI: str = os.environ.get("SPOTIFY_REDIRECT_URI", "http://127.0.0.1:8767/callback").strip()
 SPOTIFY_DEVICE_ID: str = os.environ.get("SPOTIFY_DEVICE_ID", "").strip()  # optional: cabin display device
-# Optional: macOS system audio output device name (SwitchAudioSource). When set, Spotify playback is routed to this device. Run: SwitchAudioSource -a (use exact name; spaces are fine, no quotes needed in .env).
+# Optional: macOS system audio output device name (set via CoreAudio, else SwitchAudioSource). When set, Spotify playback is routed to this device. Run: SwitchAudioSource -a (use exact name; spaces are fine, no quotes needed in .env).
 SPOTIFY_OUTPUT_DEVICE_NAME: str = os.environ.get("SPOTIFY_OUTPUT_DEVICE_NAME", "").strip()
 SPOTIFY_TOKEN_PORT: int = int(os.environ.get("SPOTIFY_TOKEN_PORT", "8766"))  # for display to get SDK token
 USE_SPOTIFY: bool = bool(SPOTIFY_CLIENT_ID and SPOTIFY_CLIENT_SECRET and SPOTIFY_REFRESH_TOKEN)
@@ -3,6 +3,7 @@
  */
 
 const WS_URL = `ws://${location.hostname}:8765`;
+const AUDIO_LEVEL_TAG = 0x01;
 
 let ws = null;
 let reconnectTimer = null;
@@ -18,12 +19,21 @@ function setConnectionStatus(status, isError) {
 function connect() {
   setConnectionStatus('Connecting…');
   ws = new WebSocket(WS_URL);
+  ws.binaryType = 'arraybuffer';
   ws.onopen = () => {
     console.log('Display WS connected');
     setConnectionStatus('');
     if (reconnectTimer) clearTimeout(reconnectTimer);
   };
   ws.onmessage = (event) => {
+    // Binary frames: 0x01 tag + little-endian float32 audio level (0.0–1.0)
+    if (event.data instanceof ArrayBuffer) {
+      const view = new DataView(event.data);
+      if (view.byteLength >= 5 && view.getUint8(0) === AUDIO_LEVEL_TAG && window.presenceLayer) {
+        window.presenceLayer.setAudioLevel(view.getFloat32(1, true));
+      }
+      return;
+    }
     try {
       const msg = JSON.parse(event.data);
       if (msg.type === 'audio_level') {
@@ -0,0 +1,28 @@
+"""Per-client display queue eviction when a client falls behind."""
+
+import asyncio
+
+from agent import display_server
+
+
+def _full_queue(*items: str | bytes) -> asyncio.Queue[str | bytes]:
+    queue: asyncio.Queue[str | bytes] = asyncio.Queue(maxsize=len(items))
+    for item in items:
+        queue.put_nowait(item)
+    return queue
+
+
+def _drain(queue: asyncio.Queue[str | bytes]) -> list[str | bytes]:
+    return [queue.get_nowait() for _ in range(queue.qsize())]
+
+
+def test_full_queue_evicts_level_frame_before_layout() -> None:
+    queue = _full_queue('{"layout": 1}', b"\x01level", '{"layout": 2}')
+    display_server._enqueue(queue, '{"layout": 3}')
+    assert _drain(queue) == ['{"layout": 1}', '{"layout": 2}', '{"layout": 3}']
+
+
+def test_full_queue_of_layouts_evicts_oldest() -> None:
+    queue = _full_queue('{"layout": 1}', '{"layout": 2}')
+    display_server._enqueue(queue, '{"layout": 3}')
+    assert _drain(queue) == ['{"layout": 2}', '{"layout": 3}']
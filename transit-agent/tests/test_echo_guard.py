@@ -0,0 +1,17 @@
+"""Echo detection against recent agent speech."""
+
+from agent import echo_guard
+
+
+def setup_function() -> None:
+    echo_guard.clear()
+
+
+def test_echo_with_punctuation_stripped_by_stt_is_detected() -> None:
+    echo_guard.register_utterance("Sure. Lights, music, climate, and weather, just ask.")
+    assert echo_guard.is_echo("sure lights music climate and weather just ask")
+
+
+def test_unrelated_transcript_is_not_echo() -> None:
+    echo_guard.register_utterance("Sure. Lights, music, climate, and weather, just ask.")
+    assert not echo_guard.is_echo("what's the score of the giants game")
@@ -0,0 +1,65 @@
+"""Sentence splitting for streamed speech and the immediate ack."""
+
+import asyncio
+
+from agent import llm
+
+
+async def _aiter(deltas):
+    for d in deltas:
+        yield d
+
+
+def _streamed(deltas: list[str]) -> list[str]:
+    out: list[str] = []
+
+    async def on_sentence(s: str) -> None:
+        out.append(s)
+
+    asyncio.run(llm._stream_sentences(_aiter(deltas), on_sentence))
+    return out
+
+
+def test_street_abbreviation_does_not_split_sentence() -> None:
+    assert _streamed(["Arriving at Main St. Station in 2 min.", " Enjoy."]) == [
+        "Arriving at Main St. Station in 2 min.",
+        "Enjoy.",
+    ]
+
+
+def test_decimal_split_across_deltas_stays_whole() -> None:
+    assert _streamed(["It's 72", ".5 degrees and sunny. ", "Anything else?"]) == [
+        "It's 72.5 degrees and sunny.",
+        "Anything else?",
+    ]
+
+
+class _Event:
+    def __init__(self, type: str, text: str = "", block_type: str = "") -> None:
+        self.type = type
+        self.text = text
+        self.content_block = _Event(block_type) if block_type else None
+
+
+def _acked(events: list[_Event]) -> tuple[str, list[str]]:
+    spoken: list[str] = []
+
+    async def on_ack(s: str) -> None:
+        spoken.append(s)
+
+    return asyncio.run(llm._ack_from_stream(_aiter(events), on_ack)), spoken
+
+
+def test_ack_keeps_decimal_and_abbreviation_intact() -> None:
+    acked, spoken = _acked([
+        _Event("text", "It's 72"),
+        _Event("text", ".5 degrees on Main St. right now. Checking more."),
+        _Event("content_block_start", block_type="tool_use"),
+    ])
+    assert acked == "It's 72.5 degrees on Main St. right now."
+    assert spoken == [acked]
+
+
+def test_no_ack_when_reply_ends_without_tools() -> None:
+    acked, spoken = _acked([_Event("text", "Sure. Lights are dimmed now.")])
+    assert acked == "" and spoken == []
@@ -2,16 +2,71 @@
 
 from __future__ import annotations
 
+import asyncio
+import json
+import logging
+import logging.handlers
+import sys
 from typing import Optional
 
 import uvicorn
 from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 
 from vehicle_api.state import CabinState, LightsState, ClimateState, AudioState
 
-app = FastAPI(title="Mock Vehicle API")
+# Optional: orjson serializes responses and stream events in C; stdlib json otherwise.
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse as DefaultResponse
+
+    _dumps = orjson.dumps
+except ImportError:
+    from fastapi.responses import JSONResponse as DefaultResponse
+
+    def _dumps(d: dict) -> bytes:
+        return json.dumps(d).encode()
+
+app = FastAPI(title="Mock Vehicle API", default_response_class=DefaultResponse)
+
+# Per-request logs are buffered and written to stdout in batches (immediately for warnings and above).
+logger = logging.getLogger("vehicle_api")
+logger.setLevel(logging.INFO)
+logger.propagate = False
+_log_target = logging.StreamHandler(sys.stdout)
+_log_target.setFormatter(logging.Formatter("[Vehicle API] %(message)s"))
+logger.addHandler(logging.handlers.MemoryHandler(capacity=64, flushLevel=logging.WARNING, target=_log_target))
+
 state = CabinState()
+# (state_key, encoded JSON) for the last state served; re-encoded only when a value changed
+_state_body: tuple[tuple, bytes] | None = None
+
+# One queue per /state/stream subscriber; maxsize 1 so a slow reader only ever gets the latest state.
+_subscribers: set[asyncio.Queue[bytes]] = set()
+
+
+def _state_json() -> bytes:
+    """Current state as JSON bytes, sent as-is so responses skip FastAPI's encode path."""
+    global _state_body
+    key = state.state_key()
+    if _state_body is None or _state_body[0] != key:
+        _state_body = (key, _dumps(state.to_dict()))
+    return _state_body[1]
+
+
+def _state_response() -> Response:
+    return Response(content=_state_json(), media_type="application/json")
+
+
+def _publish() -> Response:
+    """Current state as a response, also pushed to every /state/stream subscriber."""
+    event = b"data: " + _state_json() + b"\n\n"
+    for q in _subscribers:
+        if q.full():
+            q.get_nowait()
+        q.put_nowait(event)
+    return _state_response()
 
 
 # --- Request bodies ---
@@ -34,32 +89,49 @@ class AudioBody(BaseModel):
 # --- Endpoints ---
 
 @app.get("/state")
-def get_state() -> dict:
-    return state.to_dict()
+def get_state() -> Response:
+    return _state_response()
+
+
+@app.get("/state/stream")
+async def stream_state() -> StreamingResponse:
+    """Server-sent events: the current state immediately, then one event per change."""
+    q: asyncio.Queue[bytes] = asyncio.Queue(maxsize=1)
+    q.put_nowait(b"data: " + _state_json() + b"\n\n")
+    _subscribers.add(q)
+
+    async def events():
+        try:
+            while True:
+                yield await q.get()
+        finally:
+            _subscribers.discard(q)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 
 @app.post("/lights")
-def set_lights(body: LightsBody) -> dict:
+async def set_lights(body: LightsBody) -> Response:
     state.lights.brightness = body.brightness
     state.lights.color_temp = body.color_temp
-    print(f"[Vehicle API] lights: brightness={body.brightness}, color_temp={body.color_temp}")
-    return state.to_dict()
+    logger.info("lights: brightness=%s, color_temp=%s", body.brightness, body.color_temp)
+    return _publish()
 
 
 @app.post("/climate")
-def set_climate(body: ClimateBody) -> dict:
+async def set_climate(body: ClimateBody) -> Response:
     state.climate.temp_f = body.temp_f
     state.climate.fan_speed = body.fan_speed
-    print(f"[Vehicle API] climate: temp_f={body.temp_f}, fan_speed={body.fan_speed}")
-    return state.to_dict()
+    logger.info("climate: temp_f=%s, fan_speed=%s", body.temp_f, body.fan_speed)
+    return _publish()
 
 
 @app.post("/audio")
-def set_audio(body: AudioBody) -> dict:
+async def set_audio(body: AudioBody) -> Response:
     state.audio.action = body.action
     state.audio.genre = body.genre
-    print(f"[Vehicle API] audio: action={body.action}, genre={body.genre}")
-    return state.to_dict()
+    logger.info("audio: action=%s, genre=%s", body.action, body.genre)
+    return _publish()
 
 
 def run(port: Optional[int] = None) -> None:
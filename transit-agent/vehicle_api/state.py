@@ -29,6 +29,8 @@ class CabinState:
     lights: LightsState = field(default_factory=LightsState)
     climate: ClimateState = field(default_factory=ClimateState)
     audio: AudioState = field(default_factory=AudioState)
+    # (state_key, dict) from the last to_dict(); sub-states are mutated in place, so it is validated by value
+    _dict_cache: Optional[tuple[tuple, dict]] = field(default=None, init=False, repr=False, compare=False)
 
     @classmethod
     def from_dict(cls, d: dict) -> "CabinState":
@@ -51,8 +53,18 @@ class CabinState:
             ),
         )
 
+    def state_key(self) -> tuple:
+        """All leaf values; equal keys mean equal to_dict() output."""
+        lights, climate, audio = self.lights, self.climate, self.audio
+        return (lights.brightness, lights.color_temp, climate.temp_f, climate.fan_speed, audio.action, audio.genre)
+
     def to_dict(self) -> dict:
-        return {
+        """Nested dict of the state, rebuilt only when a value changed. Treat the result as read-only."""
+        key = self.state_key()
+        cached = self._dict_cache
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        d = {
             "lights": {
                 "brightness": self.lights.brightness,
                 "color_temp": self.lights.color_temp,
@@ -66,3 +78,5 @@ class CabinState:
                 "genre": self.audio.genre,
             },
         }
+        self._dict_cache = (key, d)
+        return d